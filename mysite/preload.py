@@ -0,0 +1,88 @@
+"""Warm-up of a worker process before it serves traffic.
+
+``mysite.wsgi`` and ``mysite.asgi`` call :func:`preload` at import time, so
+a server that imports the application before forking (such as
+``gunicorn --preload``) shares the warmed-up modules with every worker.
+Set DJANGO_PRELOAD=0 to skip it and DJANGO_PRELOAD_CACHES=1 to also prime
+the caches of open questions.
+"""
+import logging
+import os
+import time
+from importlib import import_module
+
+from django.apps import apps
+from django.db import DatabaseError, connections
+from django.template.loader import get_template
+from django.urls import resolve, reverse
+from django.utils.module_loading import module_has_submodule
+
+log = logging.getLogger(__name__)
+
+PRELOAD_MODULES = ['models', 'admin', 'views', 'urls']
+PRELOAD_TEMPLATES = [
+    'base_generic.html',
+    'polls/index.html',
+    'polls/detail.html',
+    'polls/results.html',
+    'polls/survey.html',
+    'registration/login.html',
+]
+
+
+def import_app_modules():
+    """Import the commonly used modules of every installed application."""
+    for app_config in apps.get_app_configs():
+        for name in PRELOAD_MODULES:
+            if module_has_submodule(app_config.module, name):
+                import_module(f'{app_config.name}.{name}')
+
+
+def resolve_urls():
+    """Build the URL resolver by reversing and resolving every polls URL once."""
+    from polls.urls import app_name, urlpatterns
+
+    for pattern in urlpatterns:
+        kwargs = {param: 1 for param in pattern.pattern.converters}
+        resolve(reverse(f'{app_name}:{pattern.name}', kwargs=kwargs))
+
+
+def compile_templates():
+    """Load the templates of the polls pages so the cached loader keeps them compiled."""
+    for name in PRELOAD_TEMPLATES:
+        get_template(name)
+
+
+def prime_caches():
+    """Fill the open question cache, then close the connections so forked workers open their own."""
+    from polls.lifecycle import open_question_ids
+
+    try:
+        open_question_ids()
+    except DatabaseError:
+        log.exception('Preload could not prime the caches')
+    finally:
+        connections.close_all()
+
+
+def preload(started=None, caches=None):
+    """Warm up the process and return the seconds spent on each step.
+
+    ``started`` is the ``time.perf_counter()`` value taken when the WSGI/ASGI
+    module started importing, used to report the total startup time.
+    """
+    if caches is None:
+        caches = os.environ.get('DJANGO_PRELOAD_CACHES') == '1'
+    steps = [('imports', import_app_modules), ('urls', resolve_urls), ('templates', compile_templates)]
+    if caches:
+        steps.append(('caches', prime_caches))
+
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+    if started is not None:
+        timings['startup'] = time.perf_counter() - started
+    log.info('Preload: ' + ', '.join(f'{name} {seconds * 1000:.1f} ms' for name, seconds in timings.items()))
+    return timings
@@ -32,6 +32,21 @@ ALLOWED_HOSTS = ['.localhost', '127.0.0.1', '[::1]']
 
 LOGIN_REDIRECT_URL = '/'
 
+# Failed logins allowed per username or client IP before logins are
+# rejected without hashing the password. Every further failure doubles the
+# lockout, starting at LOGIN_THROTTLE_LOCKOUT seconds. The counters live in
+# the shared default cache configured in CACHES.
+AUTHENTICATION_BACKENDS = ['polls.backends.ThrottledModelBackend']
+LOGIN_THROTTLE_THRESHOLD = config('LOGIN_THROTTLE_THRESHOLD', default=5, cast=int)
+LOGIN_THROTTLE_WINDOW = config('LOGIN_THROTTLE_WINDOW', default=3600, cast=int)
+LOGIN_THROTTLE_LOCKOUT = config('LOGIN_THROTTLE_LOCKOUT', default=30, cast=int)
+LOGIN_THROTTLE_MAX_LOCKOUT = config('LOGIN_THROTTLE_MAX_LOCKOUT', default=3600, cast=int)
+
+# Number of reverse proxies in front of the site that append the client
+# address to X-Forwarded-For. With 0 the header is ignored, since clients
+# can set it to anything.
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=0, cast=int)
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -52,8 +67,17 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'polls.middleware.InvalidationMiddleware',
 ]
 
+# How workers tell each other that cached question data changed. Only use
+# 'polls.bus.LocalTransport' when running a single worker process.
+POLLS_INVALIDATION_TRANSPORT = config('POLLS_INVALIDATION_TRANSPORT', default='polls.bus.DatabaseTransport')
+
+# Run deferred post-vote work inside the request instead of leaving it to
+# the polls_worker command.
+POLLS_TASKS_EAGER = config('POLLS_TASKS_EAGER', default=False, cast=bool)
+
 ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
@@ -86,6 +110,19 @@ DATABASES = {
 }
 
 
+# Cache shared by every worker process. The login throttle, the open question
+# set and the per-user vote mappings must not live in a per-process cache,
+# and MAX_ENTRIES is high so that bursts do not cull throttle locks. Create
+# the table with `python manage.py createcachetable` after migrating.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('CACHE_LOCATION', default='polls_cache'),
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=1000000, cast=int)},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
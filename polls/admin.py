@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Choice, Question
+from .models import Choice, DeferredTask, Question
 
 
 class ChoiceInline(admin.TabularInline):
@@ -14,7 +14,7 @@ class QuestionAdmin(admin.ModelAdmin):
     """Define default fields and values for a new question."""
 
     fieldsets = [
-        (None, {'fields': ['question_text']}),
+        (None, {'fields': ['question_text', 'ranked']}),
         ('Date information', {'fields': ['pub_date'],
                               'classes': ['collapse']}),
         ('End Date information', {'fields': ['end_date'],
@@ -29,5 +29,16 @@ class QuestionAdmin(admin.ModelAdmin):
 
 admin.site.register(Question, QuestionAdmin)
 
+
+class DeferredTaskAdmin(admin.ModelAdmin):
+    """List queued and dead-letter tasks."""
+
+    list_display = ('name', 'status', 'attempts', 'run_after', 'created')
+    list_filter = ['status', 'name']
+    readonly_fields = ['last_error']
+
+
+admin.site.register(DeferredTask, DeferredTaskAdmin)
+
 # Solution 1 (inefficient) for adding Choice
 # admin.site.register(Choice)
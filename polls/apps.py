@@ -5,3 +5,7 @@ class PollsConfig(AppConfig):
     """Configuration class for polls application."""
 
     name = 'polls'
+
+    def ready(self):
+        """Connect the signal receivers and register the system checks of the polls application."""
+        from . import bus, checks, lifecycle, tally, user_votes  # noqa: F401
@@ -0,0 +1,18 @@
+"""Authentication backends for polls application."""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+
+from . import throttle
+from .utils import get_client_ip
+
+
+class ThrottledModelBackend(ModelBackend):
+    """ModelBackend that rejects locked out logins before hashing the password."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        if throttle.is_locked(username, get_client_ip(request)):
+            raise PermissionDenied
+        return super().authenticate(request, username=username, password=password, **kwargs)
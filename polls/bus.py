@@ -0,0 +1,165 @@
+"""Cross-worker invalidation bus for per-question cached data.
+
+Every worker keeps a ``local_cache`` in front of the shared Django cache.
+Model signals publish "question X changed" events through the transport
+named by the POLLS_INVALIDATION_TRANSPORT setting, and every worker evicts
+its local entries for X when it polls the transport at the start of a
+request. Local entries also expire after LocalCache.timeout seconds, so a
+missed event cannot keep an entry stale for good.
+
+The bus does not touch the shared cache: writers update or delete its keys
+themselves, which only reaches every worker when the default cache is
+shared between processes. The polls.E001 system check enforces that.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Choice, InvalidationEvent, Question, RankedBallot
+
+
+class LocalCache:
+    """Per-process cache of per-question data, evicted by bus events.
+
+    Entries stored with question_id None are shared by all questions.
+    Entries expire after ``timeout`` seconds unless stored with a timeout
+    of None, which only suits values validated against the shared cache.
+    """
+
+    timeout = 30
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, question_id, name):
+        entry = self._entries.get((question_id, name))
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires is not None and time.monotonic() >= expires:
+            self._entries.pop((question_id, name), None)
+            return None
+        return value
+
+    def set(self, question_id, name, value, timeout=DEFAULT_TIMEOUT):
+        """Store a value for ``timeout`` seconds, the class default if not given."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.timeout
+        expires = None if timeout is None else time.monotonic() + timeout
+        self._entries[(question_id, name)] = (expires, value)
+
+    def evict(self, question_id):
+        """Drop every entry of the question."""
+        for key in [key for key in self._entries if key[0] == question_id]:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+local_cache = LocalCache()
+
+
+class LocalTransport:
+    """Transport for a single process, where publishing already evicted everything."""
+
+    def publish(self, question_ids):
+        pass
+
+    def receive(self):
+        return []
+
+
+class DatabaseTransport:
+    """Transport through the InvalidationEvent table shared by all workers.
+
+    Workers read new events at most once per poll_interval seconds and
+    start reading at the events published after their first poll. A
+    transaction that commits late can make an event visible below the
+    cursor, so events younger than ``overlap`` seconds are read again and
+    skipped if they were already seen.
+    """
+
+    poll_interval = 1.0
+    overlap = 10
+    retention = 600
+
+    def __init__(self):
+        self.cursor = None
+        self.seen = set()
+        self.next_poll = 0.0
+
+    def publish(self, question_ids):
+        InvalidationEvent.objects.bulk_create(
+            InvalidationEvent(question_id=question_id) for question_id in question_ids)
+
+    def receive(self):
+        now = time.monotonic()
+        if now < self.next_poll:
+            return []
+        self.next_poll = now + self.poll_interval
+        recent = timezone.now() - timezone.timedelta(seconds=self.overlap)
+        if self.cursor is None:
+            last = InvalidationEvent.objects.order_by('-id').values_list('id', flat=True).first()
+            self.cursor = last or 0
+            self.seen = set(InvalidationEvent.objects.filter(created__gte=recent).values_list('id', flat=True))
+            return []
+        events = list(InvalidationEvent.objects.filter(Q(id__gt=self.cursor) | Q(created__gte=recent))
+                      .order_by('id').values_list('id', 'question_id', 'created'))
+        fresh = [question_id for event_id, question_id, _ in events if event_id not in self.seen]
+        self.seen = {event_id for event_id, _, created in events if created >= recent}
+        if events and events[-1][0] > self.cursor:
+            self.cursor = events[-1][0]
+            self.prune()
+        return set(fresh)
+
+    def prune(self):
+        """Delete events older than the retention period."""
+        cutoff = timezone.now() - timezone.timedelta(seconds=self.retention)
+        InvalidationEvent.objects.filter(created__lt=cutoff).delete()
+
+
+_transport = None
+
+
+def get_transport():
+    """Return the transport configured for this worker."""
+    global _transport
+    if _transport is None:
+        path = getattr(settings, 'POLLS_INVALIDATION_TRANSPORT', 'polls.bus.DatabaseTransport')
+        _transport = import_string(path)()
+    return _transport
+
+
+def publish(*question_ids):
+    """Evict the questions locally and tell the other workers to do the same."""
+    for question_id in question_ids:
+        local_cache.evict(question_id)
+    get_transport().publish(question_ids)
+
+
+def poll():
+    """Evict the local entries of the questions changed by other workers."""
+    for question_id in get_transport().receive():
+        local_cache.evict(question_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed_callback(sender, instance, **kwargs):
+    publish(instance.id, None)
+
+
+# Saved ranked ballots are not published: the tally reads them as deltas,
+# which cannot see deleted ones.
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+@receiver(post_delete, sender=RankedBallot)
+def question_data_changed_callback(sender, instance, **kwargs):
+    publish(instance.question_id)
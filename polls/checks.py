@@ -0,0 +1,28 @@
+"""System checks for the deployment settings the polls application relies on."""
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Refuse a process-local default cache unless the bus runs in a single process.
+
+    The bus only evicts each worker's local_cache, so the shared entries
+    behind it (the open question set, user votes, login throttle counters)
+    must be stored where every worker sees the same value.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    transport = getattr(settings, 'POLLS_INVALIDATION_TRANSPORT', 'polls.bus.DatabaseTransport')
+    if backend in PROCESS_LOCAL_CACHES and transport != 'polls.bus.LocalTransport':
+        return [checks.Error(
+            f'The default cache {backend} is not shared between worker processes.',
+            hint='Configure a shared backend in CACHES, such as DatabaseCache, or set '
+                 'POLLS_INVALIDATION_TRANSPORT to polls.bus.LocalTransport for a single process.',
+            id='polls.E001',
+        )]
+    return []
@@ -0,0 +1,116 @@
+"""Poll lifecycle tracking with a precomputed set of open questions."""
+import math
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .bus import local_cache
+from .models import ArchivedVotes, ClosureScan, Question
+
+OPEN_QUESTIONS_KEY = 'polls:open_question_ids'
+# Upper bound on the lifetime of the cached open set, so a worker that
+# missed an invalidation catches up even without a pub/end boundary.
+OPEN_QUESTIONS_TIMEOUT = 60
+
+# Sent once for the questions whose end_date passed since the last scan.
+# Receivers get ``question_ids`` (a frozenset).
+questions_closed = Signal()
+
+
+def _build_open_questions(now):
+    """Return the open question ids and the next pub/end boundary after now."""
+    open_filter = Q(pub_date__lte=now) & (Q(end_date__isnull=True) | Q(end_date__gt=now))
+    open_ids = frozenset(Question.objects.filter(open_filter).values_list('id', flat=True))
+
+    upcoming = [
+        Question.objects.filter(pub_date__gt=now).order_by('pub_date').values_list('pub_date', flat=True).first(),
+        Question.objects.filter(end_date__gt=now).order_by('end_date').values_list('end_date', flat=True).first(),
+    ]
+    upcoming = [boundary for boundary in upcoming if boundary is not None]
+    return open_ids, min(upcoming) if upcoming else None
+
+
+def _is_current(entry, now):
+    """Return true if a cached (open ids, next boundary) entry is still valid."""
+    return entry is not None and (entry[1] is None or now < entry[1])
+
+
+def report_closed_questions(now=None):
+    """Send questions_closed for the questions whose end_date passed since the last scan.
+
+    The scanned interval is claimed with a conditional UPDATE of the
+    ClosureScan row, so concurrent workers do not report a question twice.
+    The first scan only records the time. Return the reported question ids.
+    """
+    now = now or timezone.now()
+    scan, created = ClosureScan.objects.get_or_create(pk=1, defaults={'scanned_until': now})
+    if created or scan.scanned_until >= now:
+        return frozenset()
+    if not ClosureScan.objects.filter(pk=1, scanned_until=scan.scanned_until).update(scanned_until=now):
+        return frozenset()  # claimed by another worker
+    closed = frozenset(Question.objects.filter(end_date__gt=scan.scanned_until, end_date__lte=now)
+                       .values_list('id', flat=True))
+    if closed:
+        questions_closed.send(sender=Question, question_ids=closed)
+    return closed
+
+
+def open_question_ids():
+    """Return the ids of questions that currently accept votes.
+
+    The set is read from the local cache, then the shared cache, and is
+    rebuilt lazily only when both are missing or the next known
+    pub_date/end_date boundary has been reached. Every rebuild also reports
+    the questions closed since the last one.
+    """
+    now = timezone.now()
+    entry = local_cache.get(None, OPEN_QUESTIONS_KEY)
+    if _is_current(entry, now):
+        return entry[0]
+    entry = cache.get(OPEN_QUESTIONS_KEY)
+    if _is_current(entry, now):
+        local_cache.set(None, OPEN_QUESTIONS_KEY, entry)
+        return entry[0]
+
+    open_ids, boundary = _build_open_questions(now)
+    timeout = OPEN_QUESTIONS_TIMEOUT
+    if boundary is not None:
+        timeout = min(timeout, max(1, math.ceil((boundary - now).total_seconds())))
+    cache.set(OPEN_QUESTIONS_KEY, (open_ids, boundary), timeout)
+    local_cache.set(None, OPEN_QUESTIONS_KEY, (open_ids, boundary))
+    report_closed_questions(now)
+    return open_ids
+
+
+def is_open(question_id):
+    """Return true if the question with the given id accepts votes."""
+    return question_id in open_question_ids()
+
+
+def invalidate_open_questions():
+    """Drop the cached open set so the next lookup rebuilds it."""
+    cache.delete(OPEN_QUESTIONS_KEY)
+    local_cache.evict(None)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed_callback(sender, **kwargs):
+    invalidate_open_questions()
+
+
+@receiver(post_save, sender=Question)
+def question_reopened_callback(sender, instance, raw=False, **kwargs):
+    """Move archived votes back to the live table when a closed question is reopened.
+
+    The vote views only look at live votes, so a returning voter would
+    otherwise be counted a second time.
+    """
+    if raw or not (instance.end_date is None or instance.end_date > timezone.now()):
+        return
+    archive = ArchivedVotes.objects.filter(question=instance).first()
+    if archive is not None:
+        archive.restore()
@@ -0,0 +1,64 @@
+"""Move the votes of closed questions into compact cold storage."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from polls.models import ArchivedVoterIndex, ArchivedVotes, Question, Vote
+
+
+class Command(BaseCommand):
+    """Archive the Vote rows of every question whose end_date has passed."""
+
+    help = 'Move the Vote rows of closed questions into one compact ArchivedVotes blob per question.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int,
+                            help='Only archive these questions (they must be closed).')
+
+    def handle(self, *args, **options):
+        closed = Question.objects.filter(end_date__lte=timezone.now(), vote__isnull=False).distinct()
+        if options['question_ids']:
+            closed = closed.filter(pk__in=options['question_ids'])
+
+        total = 0
+        for question in closed:
+            total += archive_question(question)
+            self.stdout.write(f'Archived votes of question {question.id}: {question}')
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} vote(s).'))
+
+
+@transaction.atomic
+def archive_question(question):
+    """Merge the live votes of the question into its archive and delete them.
+
+    Votes without a voter cannot be looked up by user and stay in the live table.
+    """
+    live = Vote.objects.filter(question=question, voter__isnull=False)
+    votes = dict(live.values_list('voter_id', 'choice_id'))
+    archive, created = ArchivedVotes.objects.select_for_update().get_or_create(
+        question=question, defaults={'choice_ids': b'', 'voters': b'', 'choices': b''})
+    merged = {} if created else archive.unpack()
+    merged.update(votes)
+    archive.pack(merged)
+    archive.save()
+    index_voters(question.id, list(votes))
+    live.delete()
+    return len(votes)
+
+
+def index_voters(question_id, voter_ids, chunk_size=10000):
+    """Add the question to the ArchivedVoterIndex of every given voter."""
+    for start in range(0, len(voter_ids), chunk_size):
+        chunk = voter_ids[start:start + chunk_size]
+        indexes = ArchivedVoterIndex.objects.in_bulk(chunk)
+        created, changed = [], []
+        for voter_id in chunk:
+            index = indexes.get(voter_id)
+            if index is None:
+                index = ArchivedVoterIndex(voter_id=voter_id)
+                index.add_question_id(question_id)
+                created.append(index)
+            elif index.add_question_id(question_id):
+                changed.append(index)
+        ArchivedVoterIndex.objects.bulk_create(created)
+        ArchivedVoterIndex.objects.bulk_update(changed, ['question_ids'])
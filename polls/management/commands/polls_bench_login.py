@@ -0,0 +1,41 @@
+"""Measure the CPU time of hashed and throttled failed logins."""
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand
+
+from polls import throttle
+
+
+class Command(BaseCommand):
+    """Compare the CPU cost of a failed login with the cost of a throttled one."""
+
+    help = 'Report the CPU time per failed login attempt with and without throttling.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=20, help='Attempts per measurement.')
+        parser.add_argument('--username', default='polls-bench-login', help='Username to attack.')
+
+    def measure(self, username, attempts, locked):
+        """Return the CPU seconds per attempt of failed logins."""
+        elapsed = 0.0
+        for _ in range(attempts):
+            throttle.reset(username)
+            if locked:
+                for _ in range(settings.LOGIN_THROTTLE_THRESHOLD):
+                    throttle.record_failure(username, None)
+            start = time.process_time()
+            authenticate(None, username=username, password='wrong password')
+            elapsed += time.process_time() - start
+        throttle.reset(username)
+        return elapsed / attempts
+
+    def handle(self, *args, **options):
+        username, attempts = options['username'], options['attempts']
+        hashed = self.measure(username, attempts, locked=False)
+        rejected = self.measure(username, attempts, locked=True)
+        self.stdout.write(f'Failed login with password hashing: {hashed * 1000:.3f} ms CPU per attempt')
+        self.stdout.write(f'Throttled login rejected before hashing: {rejected * 1000:.3f} ms CPU per attempt')
+        if rejected:
+            self.stdout.write(self.style.SUCCESS(f'Throttled attempts are {hashed / rejected:.0f}x cheaper.'))
@@ -0,0 +1,51 @@
+"""Measure the latency of the vote view with inline and deferred post-vote work."""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question
+from polls.views import vote
+
+
+class Command(BaseCommand):
+    """Compare vote latency percentiles with POLLS_TASKS_EAGER on and off.
+
+    The benchmark data is created and rolled back in one transaction.
+    """
+
+    help = 'Report p50/p99 latency of the vote view with inline and with deferred post-vote work.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=500, help='Votes per measurement.')
+
+    def measure(self, question, choices, voter, votes):
+        """Return the sorted latencies in seconds of the given number of votes."""
+        factory = RequestFactory()
+        url = reverse('polls:vote', args=(question.id,))
+        samples = []
+        for number in range(votes):
+            request = factory.post(url, {'choice': choices[number % len(choices)].id})
+            request.user = voter
+            start = time.perf_counter()
+            vote(request, question.id)
+            samples.append(time.perf_counter() - start)
+        return sorted(samples)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            voter = User.objects.create_user('polls-bench-vote')
+            question = Question.objects.create(question_text='Benchmark question',
+                                               pub_date=timezone.now() - timezone.timedelta(days=1))
+            choices = [question.choice_set.create(choice_text=f'Choice {number}') for number in range(4)]
+            for label, eager in (('inline', True), ('deferred', False)):
+                with override_settings(POLLS_TASKS_EAGER=eager):
+                    samples = self.measure(question, choices, voter, options['votes'])
+                p50 = samples[len(samples) // 2]
+                p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+                self.stdout.write(f'{label:>8}: p50 {p50 * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms')
+            transaction.set_rollback(True)
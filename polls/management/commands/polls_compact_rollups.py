@@ -0,0 +1,15 @@
+"""Merge old vote rollup buckets into coarser ones."""
+from django.core.management.base import BaseCommand
+
+from polls import rollups
+
+
+class Command(BaseCommand):
+    """Compact minute rollups into hours and hour rollups into days."""
+
+    help = 'Merge minute vote rollups older than a day into hours and hour rollups older than 30 days into days.'
+
+    def handle(self, *args, **options):
+        minutes, hours = rollups.compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Merged {minutes} minute bucket(s) into hours and {hours} hour bucket(s) into days.'))
@@ -0,0 +1,153 @@
+"""Generate a synthetic polls dataset for scale testing."""
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from polls import bus
+from polls.lifecycle import invalidate_open_questions
+from polls.models import Choice, Question, Vote, VoteRollup
+from polls.user_votes import invalidate_user_votes
+
+QUESTION_PREFIX = 'Seed question'
+USER_PREFIX = 'seed-user-'
+
+
+def zipf_weights(count, exponent):
+    """Return the Zipf weights of ranks 1 to count."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def allocate(total, weights, cap):
+    """Split total into parts proportional to the weights, with no part above cap."""
+    weight_sum = sum(weights)
+    parts = [min(cap, int(total * weight / weight_sum)) for weight in weights]
+    remaining = total - sum(parts)
+    for index in range(len(parts)):
+        if remaining <= 0:
+            break
+        extra = min(cap - parts[index], remaining)
+        parts[index] += extra
+        remaining -= extra
+    return parts
+
+
+class Command(BaseCommand):
+    """Seed questions, choices, users and Zipf-distributed votes, deterministically for a seed."""
+
+    help = ('Generate questions with skewed pub/end dates, choices, users and Zipf-distributed votes '
+            'with consistent Choice.votes counters.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=100, help='Number of questions.')
+        parser.add_argument('--choices', type=int, default=4, help='Choices per question.')
+        parser.add_argument('--users', type=int, default=10000, help='Number of users.')
+        parser.add_argument('--votes', type=int, default=100000, help='Number of votes.')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of question and choice popularity.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed.')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per bulk_create chunk.')
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded questions and users first.')
+
+    def bulk_create(self, model, objects, chunk_size):
+        """Insert the objects in chunks of chunk_size rows."""
+        for start in range(0, len(objects), chunk_size):
+            model.objects.bulk_create(objects[start:start + chunk_size], batch_size=chunk_size)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rng = random.Random(options['seed'])
+        n_questions, n_choices, n_users = options['questions'], options['choices'], options['users']
+        chunk_size = options['chunk_size']
+        if min(n_questions, n_choices, n_users) < 1:
+            raise CommandError('--questions, --choices and --users must be at least 1.')
+        if options['clear']:
+            Question.objects.filter(question_text__startswith=QUESTION_PREFIX).delete()
+            User.objects.filter(username__startswith=USER_PREFIX).delete()
+        if User.objects.filter(username__startswith=USER_PREFIX).exists():
+            raise CommandError('Seeded users already exist, use --clear to replace them.')
+
+        now = timezone.now().replace(microsecond=0)
+        with transaction.atomic():
+            password = make_password(None)
+            self.bulk_create(User, [User(username=f'{USER_PREFIX}{number}', password=password)
+                                    for number in range(n_users)], chunk_size)
+            voter_ids = list(User.objects.filter(username__startswith=USER_PREFIX)
+                             .order_by('id').values_list('id', flat=True))
+
+            # Most questions are recent; some are scheduled, some closed, most open ended.
+            questions = []
+            for number in range(n_questions):
+                pub_date = now - timedelta(minutes=int(rng.expovariate(1 / (60 * 24 * 14))))
+                if rng.random() < 0.05:
+                    pub_date = now + timedelta(minutes=rng.randint(1, 60 * 24 * 7))
+                end_date = None
+                if rng.random() < 0.4:
+                    end_date = pub_date + timedelta(minutes=int(rng.expovariate(1 / (60 * 24 * 7))) + 1)
+                questions.append(Question(question_text=f'{QUESTION_PREFIX} #{number}?',
+                                          pub_date=pub_date, end_date=end_date))
+            self.bulk_create(Question, questions, chunk_size)
+            questions = list(Question.objects.filter(question_text__startswith=QUESTION_PREFIX).order_by('id'))
+
+            # Only published questions get votes, split by Zipf popularity.
+            voted = [question for question in questions if question.pub_date <= now]
+            rng.shuffle(voted)
+            per_question = allocate(options['votes'], zipf_weights(len(voted), options['zipf']), n_users)
+            choice_weights = zipf_weights(n_choices, options['zipf'])
+            picks = {}
+            for question, count in zip(voted, per_question):
+                picks[question.id] = (rng.sample(voter_ids, count),
+                                      rng.choices(range(n_choices), weights=choice_weights, k=count))
+
+            choices = []
+            for question in questions:
+                counts = [0] * n_choices
+                for index in picks.get(question.id, ((), ()))[1]:
+                    counts[index] += 1
+                choices.extend(Choice(question=question, choice_text=f'Choice {index + 1}', votes=counts[index])
+                               for index in range(n_choices))
+            self.bulk_create(Choice, choices, chunk_size)
+            choice_ids = {}
+            for choice_id, question_id in (Choice.objects.filter(question__in=questions)
+                                           .order_by('id').values_list('id', 'question_id')):
+                choice_ids.setdefault(question_id, []).append(choice_id)
+
+            votes, daily = [], {}
+            total = 0
+            tz = timezone.get_current_timezone()
+            by_id = {question.id: question for question in questions}
+            for question_id, (voters, indexes) in picks.items():
+                question = by_id[question_id]
+                opened = question.pub_date
+                span = ((min(question.end_date, now) if question.end_date else now) - opened).total_seconds()
+                for voter_id, index in zip(voters, indexes):
+                    choice_id = choice_ids[question_id][index]
+                    voted_at = opened + timedelta(seconds=rng.random() * span)
+                    votes.append(Vote(question_id=question_id, choice_id=choice_id, voter_id=voter_id,
+                                      voted_at=voted_at))
+                    day = voted_at.astimezone(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+                    daily[(question_id, choice_id, day)] = daily.get((question_id, choice_id, day), 0) + 1
+                    if len(votes) >= chunk_size:
+                        total += len(votes)
+                        Vote.objects.bulk_create(votes, batch_size=chunk_size)
+                        votes = []
+            total += len(votes)
+            Vote.objects.bulk_create(votes, batch_size=chunk_size)
+            self.bulk_create(VoteRollup, [
+                VoteRollup(question_id=question_id, choice_id=choice_id, resolution=VoteRollup.DAY,
+                           bucket=day, count=count)
+                for (question_id, choice_id, day), count in daily.items()
+            ], chunk_size)
+
+        # Only the polls entries the seed changed; the rest of the shared cache,
+        # such as login throttle locks, is left alone.
+        invalidate_open_questions()
+        invalidate_user_votes(voter_ids)
+        bus.publish(None, *by_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(questions)} questions, {len(choices)} choices, {n_users} users and {total} votes '
+            f'in {time.perf_counter() - started:.1f}s.'))
@@ -0,0 +1,28 @@
+"""Run the deferred tasks queued by requests."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls import tasks
+
+
+class Command(BaseCommand):
+    """Process the deferred task queue in batches until stopped."""
+
+    help = 'Run queued deferred tasks in batches, retrying failures and moving exhausted ones to the dead-letter list.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Tasks claimed per batch.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Stop once no task is due.')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            claimed = tasks.run_pending(options['batch_size'])
+            total += claimed
+            if not claimed:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Ran {total} task(s).'))
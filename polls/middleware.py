@@ -0,0 +1,13 @@
+"""Middleware of polls application."""
+from . import bus
+
+
+class InvalidationMiddleware:
+    """Apply invalidation events of other workers before handling a request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        bus.poll()
+        return self.get_response(request)
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.14 on 2026-10-19 19:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_vote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedVotes',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('choice_ids', models.BinaryField()),
+                ('voters', models.BinaryField()),
+                ('choices', models.BinaryField()),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archived_votes', to='polls.question')),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.14 on 2026-10-19 19:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0004_archivedvotes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='ranked',
+            field=models.BooleanField(default=False, verbose_name='ranked-choice'),
+        ),
+        migrations.CreateModel(
+            name='RankedBallot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking', models.BinaryField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+                ('voter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('question', 'voter')},
+            },
+        ),
+    ]
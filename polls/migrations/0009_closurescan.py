@@ -0,0 +1,20 @@
+# Generated by Django 3.1.14 on 2026-10-19 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_deferredtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClosureScan',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scanned_until', models.DateTimeField()),
+            ],
+        ),
+    ]
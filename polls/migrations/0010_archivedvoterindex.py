@@ -0,0 +1,38 @@
+# Generated by Django 3.1.14 on 2026-10-19 20:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from polls.models import _pack, _unpack
+
+
+def index_archived_voters(apps, schema_editor):
+    """Build the voter index of the archives written before it existed."""
+    ArchivedVotes = apps.get_model('polls', 'ArchivedVotes')
+    ArchivedVoterIndex = apps.get_model('polls', 'ArchivedVoterIndex')
+    question_ids = {}
+    for archive in ArchivedVotes.objects.iterator():
+        for voter_id in _unpack(archive.voters, 'q'):
+            question_ids.setdefault(voter_id, []).append(archive.question_id)
+    ArchivedVoterIndex.objects.bulk_create(
+        [ArchivedVoterIndex(voter_id=voter_id, question_ids=_pack(ids, 'q')) for voter_id, ids in question_ids.items()],
+        batch_size=10000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('polls', '0009_closurescan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedVoterIndex',
+            fields=[
+                ('voter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archived_index', serialize=False, to='auth.user')),
+                ('question_ids', models.BinaryField(default=b'')),
+            ],
+        ),
+        migrations.RunPython(index_archived_voters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1.14 on 2026-10-19 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_archivedvoterindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rankedballot',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='rankedballot',
+            index=models.Index(fields=['question', 'updated'], name='polls_ranke_questio_28af7e_idx'),
+        ),
+    ]
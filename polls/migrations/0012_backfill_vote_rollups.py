@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import F, Min, Sum
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll up the votes cast before rollups existed, so every choice's series sums to Choice.votes.
+
+    Each choice gets one day bucket holding the difference between its
+    counter and its rolled-up total, on the day of the earliest vote or
+    bucket of its question, ahead of the buckets it is compared with.
+    """
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    VoteRollup = apps.get_model('polls', 'VoteRollup')
+    rolled_up = dict(VoteRollup.objects.values('choice_id').annotate(total=Sum('count'))
+                     .values_list('choice_id', 'total'))
+    first_vote = dict(Vote.objects.values('question_id').annotate(first=Min('voted_at'))
+                      .values_list('question_id', 'first'))
+    first_bucket = dict(VoteRollup.objects.values('question_id').annotate(first=Min('bucket'))
+                        .values_list('question_id', 'first'))
+    now = timezone.now()
+    for choice in Choice.objects.only('id', 'question_id', 'votes').iterator():
+        missing = choice.votes - rolled_up.get(choice.id, 0)
+        if not missing:
+            continue
+        starts = [start for start in (first_vote.get(choice.question_id), first_bucket.get(choice.question_id))
+                  if start is not None]
+        day = timezone.localtime(min(starts, default=now)).replace(hour=0, minute=0, second=0, microsecond=0)
+        bucket, created = VoteRollup.objects.get_or_create(
+            question_id=choice.question_id, choice_id=choice.id, resolution='day', bucket=day,
+            defaults={'count': missing})
+        if not created:
+            VoteRollup.objects.filter(pk=bucket.pk).update(count=F('count') + missing)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_rankedballot_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.1.14 on 2026-10-19 21:40
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, F
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """Keep only the latest vote of a voter on a question and uncount the others."""
+    Vote = apps.get_model('polls', 'Vote')
+    Choice = apps.get_model('polls', 'Choice')
+    duplicated = (Vote.objects.filter(voter__isnull=False).values('question_id', 'voter_id')
+                  .annotate(count=Count('id')).filter(count__gt=1))
+    for group in duplicated:
+        votes = list(Vote.objects.filter(question_id=group['question_id'], voter_id=group['voter_id'])
+                     .order_by('-voted_at', '-id').values_list('id', 'choice_id'))
+        deltas = {}
+        for _, choice_id in votes[1:]:
+            deltas[choice_id] = deltas.get(choice_id, 0) + 1
+        Vote.objects.filter(pk__in=[vote_id for vote_id, _ in votes[1:]]).delete()
+        for choice_id, delta in deltas.items():
+            Choice.objects.filter(pk=choice_id).update(votes=F('votes') - delta)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0012_backfill_vote_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together={('question', 'voter')},
+        ),
+    ]
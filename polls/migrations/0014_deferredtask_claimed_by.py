@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-19 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0013_vote_unique_voter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deferredtask',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -1,6 +1,10 @@
 """All database models for polls application."""
+import bisect
 import datetime
-from django.db import models
+import sys
+from array import array
+
+from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
 
@@ -11,6 +15,7 @@ class Question(models.Model):
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('date ended', default=None, null=True)
+    ranked = models.BooleanField('ranked-choice', default=False)
 
     def __str__(self):
         return self.question_text
@@ -58,5 +63,219 @@ class Vote(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
     voter = models.ForeignKey(User, blank=True, null=True, on_delete=models.CASCADE)
+    voted_at = models.DateTimeField('date voted', default=timezone.now)
+
+    class Meta:
+        """Meta setting for Vote Model."""
+
+        unique_together = ['question', 'voter']
 
     # def create_or_update_per_user(self, selected_choice):
+
+
+class RankedBallot(models.Model):
+    """Ballot of a ranked-choice question.
+
+    ``ranking`` holds the ids of the ranked choices in order of preference.
+    ``updated`` lets the tally read only the ballots saved since its cursor.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    voter = models.ForeignKey(User, on_delete=models.CASCADE)
+    ranking = models.BinaryField()
+    updated = models.DateTimeField(auto_now=True)
+
+    RANKING_TYPECODE = 'I'
+
+    class Meta:
+        """Meta setting for RankedBallot Model."""
+
+        unique_together = ['question', 'voter']
+        indexes = [models.Index(fields=['question', 'updated'])]
+
+    def get_ranking(self):
+        """Return the ranked choice ids in order of preference."""
+        return list(_unpack(self.ranking, self.RANKING_TYPECODE))
+
+    def set_ranking(self, choice_ids):
+        """Store the ranked choice ids in order of preference."""
+        self.ranking = _pack(choice_ids, self.RANKING_TYPECODE)
+
+
+class VoteRollup(models.Model):
+    """Net number of votes a choice gained within one time bucket."""
+
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    DAY = 'day'
+    RESOLUTIONS = [(MINUTE, 'Minute'), (HOUR, 'Hour'), (DAY, 'Day')]
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    resolution = models.CharField(max_length=6, choices=RESOLUTIONS, default=MINUTE)
+    bucket = models.DateTimeField('bucket start')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        """Meta setting for VoteRollup Model."""
+
+        unique_together = ['choice', 'resolution', 'bucket']
+        indexes = [models.Index(fields=['question', 'bucket'])]
+
+
+class InvalidationEvent(models.Model):
+    """Notice to every worker that cached data of a question changed.
+
+    A null question_id means data shared by all questions changed.
+    """
+
+    question_id = models.IntegerField(null=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class ClosureScan(models.Model):
+    """Time up to which closed questions were reported by the questions_closed signal.
+
+    There is a single row. Workers advance ``scanned_until`` with a
+    conditional UPDATE, so every closure is reported by one worker only.
+    """
+
+    scanned_until = models.DateTimeField()
+
+
+class DeferredTask(models.Model):
+    """Non-essential work queued by a request for the polls_worker command.
+
+    ``claimed_by`` is the token of the claim that holds the current lease.
+    """
+
+    PENDING = 'pending'
+    DEAD = 'dead'
+    STATUSES = [(PENDING, 'Pending'), (DEAD, 'Dead')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=7, choices=STATUSES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        """Meta setting for DeferredTask Model."""
+
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+
+def _pack(values, typecode):
+    """Return the values as a little-endian array blob."""
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(blob, typecode):
+    """Return the array stored in a little-endian blob."""
+    unpacked = array(typecode)
+    unpacked.frombytes(bytes(blob))
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked
+
+
+def _view(blob, typecode):
+    """Return an indexable view of an array blob without copying it when possible."""
+    if sys.byteorder == 'little':
+        return memoryview(blob).cast('B').cast(typecode)
+    return _unpack(blob, typecode)
+
+
+class ArchivedVotes(models.Model):
+    """Compact cold storage of the votes of a closed question.
+
+    ``voters`` holds the sorted voter ids and ``choices`` holds, at the same
+    positions, the index of the chosen choice in ``choice_ids``.
+    """
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='archived_votes')
+    choice_ids = models.BinaryField()
+    voters = models.BinaryField()
+    choices = models.BinaryField()
+
+    VOTER_TYPECODE = 'q'
+    CHOICE_ID_TYPECODE = 'q'
+    CHOICE_INDEX_TYPECODE = 'H'
+
+    def __str__(self):
+        return f'Archived votes of {self.question}'
+
+    def pack(self, votes):
+        """Store the given mapping of voter id to choice id."""
+        choice_ids = sorted(set(votes.values()))
+        index_of = {choice_id: index for index, choice_id in enumerate(choice_ids)}
+        voters = sorted(votes)
+        self.choice_ids = _pack(choice_ids, self.CHOICE_ID_TYPECODE)
+        self.voters = _pack(voters, self.VOTER_TYPECODE)
+        self.choices = _pack((index_of[votes[voter]] for voter in voters), self.CHOICE_INDEX_TYPECODE)
+
+    def unpack(self):
+        """Return the stored votes as a mapping of voter id to choice id."""
+        choice_ids = _unpack(self.choice_ids, self.CHOICE_ID_TYPECODE)
+        choices = _unpack(self.choices, self.CHOICE_INDEX_TYPECODE)
+        voters = _unpack(self.voters, self.VOTER_TYPECODE)
+        return {voter: choice_ids[index] for voter, index in zip(voters, choices)}
+
+    def choice_id_for(self, voter_id):
+        """Return the id of the choice voted by the given voter, or None."""
+        voters = _view(self.voters, self.VOTER_TYPECODE)
+        position = bisect.bisect_left(voters, voter_id)
+        if position == len(voters) or voters[position] != voter_id:
+            return None
+        index = _view(self.choices, self.CHOICE_INDEX_TYPECODE)[position]
+        return _view(self.choice_ids, self.CHOICE_ID_TYPECODE)[index]
+
+    def restore(self):
+        """Move the votes back into the live Vote table and delete the archive.
+
+        Voters who already have a live vote keep it.
+        """
+        with transaction.atomic():
+            live = set(Vote.objects.filter(question_id=self.question_id).values_list('voter_id', flat=True))
+            Vote.objects.bulk_create(
+                Vote(question_id=self.question_id, choice_id=choice_id, voter_id=voter_id)
+                for voter_id, choice_id in self.unpack().items() if voter_id not in live)
+            self.delete()
+
+    def __len__(self):
+        return len(_view(self.voters, self.VOTER_TYPECODE))
+
+
+class ArchivedVoterIndex(models.Model):
+    """Ids of the archived questions a user voted on, so their votes are found without scanning every archive.
+
+    Entries of questions whose archive was restored are left in place and
+    skipped on lookup.
+    """
+
+    voter = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='archived_index')
+    question_ids = models.BinaryField(default=b'')
+
+    QUESTION_ID_TYPECODE = 'q'
+
+    def get_question_ids(self):
+        """Return the ids of the archived questions the user voted on."""
+        return list(_unpack(self.question_ids, self.QUESTION_ID_TYPECODE))
+
+    def add_question_id(self, question_id):
+        """Add a question id, returning false if it was already indexed."""
+        question_ids = self.get_question_ids()
+        if question_id in question_ids:
+            return False
+        question_ids.append(question_id)
+        self.question_ids = _pack(question_ids, self.QUESTION_ID_TYPECODE)
+        return True
@@ -0,0 +1,107 @@
+"""Time-bucketed vote rollups used for result charts."""
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import Choice, VoteRollup
+
+# Minute buckets older than this are merged into hour buckets, and hour
+# buckets older than HOUR_RETENTION into day buckets.
+MINUTE_RETENTION = datetime.timedelta(days=1)
+HOUR_RETENTION = datetime.timedelta(days=30)
+
+TRUNCATE = {VoteRollup.HOUR: TruncHour, VoteRollup.DAY: TruncDay}
+ORDER = [VoteRollup.MINUTE, VoteRollup.HOUR, VoteRollup.DAY]
+
+
+def minute_bucket(when):
+    """Return the start of the minute bucket holding the given time."""
+    return when.replace(second=0, microsecond=0)
+
+
+def increment(question_id, choice_id, bucket, delta=1, resolution=VoteRollup.MINUTE):
+    """Add delta to the count of a bucket, creating the bucket if needed."""
+    bucket_filter = VoteRollup.objects.filter(choice_id=choice_id, resolution=resolution, bucket=bucket)
+    if bucket_filter.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            VoteRollup.objects.create(question_id=question_id, choice_id=choice_id,
+                                      resolution=resolution, bucket=bucket, count=delta)
+    except IntegrityError:  # created concurrently
+        bucket_filter.update(count=F('count') + delta)
+
+
+def record_vote(question_id, choice_id, prev_choice_id=None, when=None):
+    """Roll up a vote, moving it away from the previous choice on a re-vote."""
+    record_votes([(question_id, choice_id, prev_choice_id)], when)
+
+
+def record_votes(votes, when=None):
+    """Roll up (question id, choice id, previous choice id) votes with one increment per affected choice.
+
+    Choices deleted since the vote, with their question or alone, are skipped.
+    """
+    deltas = {}
+    for question_id, choice_id, prev_choice_id in votes:
+        if choice_id == prev_choice_id:
+            continue
+        deltas[(question_id, choice_id)] = deltas.get((question_id, choice_id), 0) + 1
+        if prev_choice_id is not None:
+            deltas[(question_id, prev_choice_id)] = deltas.get((question_id, prev_choice_id), 0) - 1
+    existing = set(Choice.objects.filter(pk__in=[choice_id for _, choice_id in deltas])
+                   .values_list('question_id', 'id'))
+    bucket = minute_bucket(when or timezone.now())
+    for (question_id, choice_id), delta in deltas.items():
+        if delta and (question_id, choice_id) in existing:
+            increment(question_id, choice_id, bucket, delta)
+
+
+@transaction.atomic
+def merge(source, target, older_than):
+    """Merge source buckets that start before older_than into target buckets.
+
+    Return the number of merged source buckets.
+    """
+    old = VoteRollup.objects.filter(resolution=source, bucket__lt=older_than)
+    merged = (old.annotate(target_bucket=TRUNCATE[target]('bucket'))
+              .values('question_id', 'choice_id', 'target_bucket')
+              .annotate(total=Sum('count')))
+    for row in merged:
+        increment(row['question_id'], row['choice_id'], row['target_bucket'], row['total'], target)
+    deleted, _ = old.delete()
+    return deleted
+
+
+def compact(now=None):
+    """Merge old minute buckets into hours and old hour buckets into days."""
+    now = now or timezone.now()
+    return (merge(VoteRollup.MINUTE, VoteRollup.HOUR, now - MINUTE_RETENTION),
+            merge(VoteRollup.HOUR, VoteRollup.DAY, now - HOUR_RETENTION))
+
+
+def series(question, resolution=VoteRollup.MINUTE):
+    """Return the vote counts of the question per choice and bucket, oldest first.
+
+    Buckets finer than the requested resolution are summed into it, coarser
+    buckets left by the compactor are returned as they are.
+    """
+    rows = []
+    finer = ORDER[:ORDER.index(resolution)]
+    rollups = VoteRollup.objects.filter(question=question)
+    for stored in ORDER:
+        stored_rollups = rollups.filter(resolution=stored)
+        if stored in finer:
+            stored_rollups = stored_rollups.annotate(start=TRUNCATE[resolution]('bucket'))
+        else:
+            stored_rollups = stored_rollups.annotate(start=F('bucket'))
+        rows.extend(stored_rollups.values('start', 'choice_id').annotate(total=Sum('count')))
+    totals = {}
+    for row in rows:
+        key = (row['start'], row['choice_id'])
+        totals[key] = totals.get(key, 0) + row['total']
+    return [{'bucket': start, 'choice': choice_id, 'count': count}
+            for (start, choice_id), count in sorted(totals.items())]
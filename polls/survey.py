@@ -0,0 +1,93 @@
+"""Batch voting on many questions in one request."""
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import bus, tasks
+from .lifecycle import open_question_ids
+from .models import Choice, Vote
+from .user_votes import record_user_votes
+
+
+def selections_from_post(data):
+    """Return the choice_<question id> fields of a survey as a question id to choice id mapping.
+
+    Raise ValueError if a field does not hold numbers.
+    """
+    selections = {}
+    for key, value in data.items():
+        if key.startswith('choice_'):
+            selections[int(key[len('choice_'):])] = int(value)
+    return selections
+
+
+def validate_selections(selections):
+    """Return the selections that pick a choice of an open single-choice question.
+
+    All selections are checked with one query.
+    """
+    open_ids = open_question_ids()
+    candidates = Choice.objects.filter(
+        pk__in=selections.values(), question_id__in=[pk for pk in selections if pk in open_ids],
+        question__ranked=False,
+    ).values_list('id', 'question_id')
+    return {question_id: choice_id for choice_id, question_id in candidates
+            if selections[question_id] == choice_id}
+
+
+def submit_survey(voter, selections, ip=None):
+    """Store the votes of a survey and apply their counter deltas.
+
+    New votes are inserted with one bulk query and changed votes updated with
+    another, followed by one UPDATE per choice whose counter changes. The
+    log line and the rollups are left to the deferred task queue.
+
+    A vote inserted by a concurrent submission of the same voter makes the
+    insert violate the (question, voter) constraint; the survey is then
+    applied again on top of it.
+    """
+    try:
+        _submit_survey(voter, selections, ip)
+    except IntegrityError:
+        _submit_survey(voter, selections, ip)
+
+
+def _existing_votes(voter, question_ids):
+    """Return the locked votes of the voter on the questions, by question id."""
+    return {vote.question_id: vote for vote in
+            Vote.objects.select_for_update().filter(voter=voter, question_id__in=question_ids)}
+
+
+@transaction.atomic
+def _submit_survey(voter, selections, ip):
+    now = timezone.now()
+    existing = _existing_votes(voter, selections)
+    created, changed, rolled_up = [], [], []
+    deltas = {}
+    for question_id, choice_id in selections.items():
+        vote = existing.get(question_id)
+        prev_choice_id = vote.choice_id if vote else None
+        rolled_up.append([question_id, choice_id, prev_choice_id])
+        if vote is None:
+            created.append(Vote(question_id=question_id, choice_id=choice_id, voter=voter, voted_at=now))
+        elif prev_choice_id != choice_id:
+            vote.choice_id = choice_id
+            vote.voted_at = now
+            changed.append(vote)
+            deltas[prev_choice_id] = deltas.get(prev_choice_id, 0) - 1
+        else:
+            continue
+        deltas[choice_id] = deltas.get(choice_id, 0) + 1
+
+    Vote.objects.bulk_create(created)
+    Vote.objects.bulk_update(changed, ['choice', 'voted_at'])
+    for choice_id, delta in deltas.items():
+        if delta:
+            Choice.objects.filter(pk=choice_id).update(votes=F('votes') + delta)
+    tasks.enqueue('after_vote', voter=str(voter), ip=ip, date=str(datetime.now()),
+                  question_ids=sorted(selections), when=now.isoformat(), votes=rolled_up)
+    # Caches are only touched once the votes are committed.
+    transaction.on_commit(lambda: record_user_votes(voter, selections))
+    transaction.on_commit(lambda: bus.publish(*selections))
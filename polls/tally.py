@@ -0,0 +1,191 @@
+"""Instant-runoff tally engine for ranked-choice questions.
+
+The decoded ballot matrix of a question is only kept in the per-process
+``local_cache``. Every lookup reads the ballots saved since the tally's
+cursor (RankedBallot.updated) and applies them as a delta, so ballots of
+every worker are picked up without rebuilding the matrix.
+"""
+import datetime
+from collections import namedtuple
+
+import numpy as np
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .bus import local_cache
+from .models import Choice, Question, RankedBallot
+
+# ``counts`` is indexed like ``Tally.choice_ids``; ``eliminated`` and
+# ``winner`` are choice ids or None.
+Round = namedtuple('Round', ['counts', 'eliminated', 'winner'])
+
+RANKING_DTYPE = np.dtype('<u4')
+
+# Ballots saved up to this long before a tally's cursor are read again, so a
+# ballot whose transaction committed late is not missed. Applying a ballot
+# twice changes nothing.
+CURSOR_OVERLAP = datetime.timedelta(seconds=10)
+
+
+def instant_runoff(matrix, n_choices):
+    """Return the instant-runoff rounds of a ballot matrix.
+
+    Every row of ``matrix`` is a ballot holding choice indexes in order of
+    preference, padded with ``n_choices`` for "no further preference". Each
+    round is a ``(counts, eliminated, winner)`` tuple of choice indexes.
+    Ties for last place eliminate the lowest index.
+    """
+    if n_choices == 0:
+        return []
+    ballots, width = matrix.shape
+    padded = np.hstack([matrix, np.full((ballots, 1), n_choices, dtype=matrix.dtype)])
+    alive = np.ones(n_choices + 1, dtype=bool)
+    alive[n_choices] = False
+    position = np.zeros(ballots, dtype=np.intp)
+    top = padded[:, 0].copy()
+
+    def advance(rows):
+        """Move the given ballots to their next preference that is still alive."""
+        while rows.size:
+            rows = rows[~alive[top[rows]] & (position[rows] < width)]
+            position[rows] += 1
+            top[rows] = padded[rows, position[rows]]
+
+    advance(np.flatnonzero(top == n_choices))
+
+    rounds = []
+    while True:
+        counts = np.bincount(top, minlength=n_choices + 1)[:n_choices]
+        candidates = np.flatnonzero(alive[:n_choices])
+        total = counts.sum()
+        if total == 0:
+            rounds.append(Round(counts, None, None))
+            return rounds
+        leader = candidates[np.argmax(counts[candidates])]
+        if counts[leader] * 2 > total or candidates.size == 1:
+            rounds.append(Round(counts, None, leader))
+            return rounds
+        loser = candidates[np.argmin(counts[candidates])]
+        rounds.append(Round(counts, loser, None))
+        alive[loser] = False
+        advance(np.flatnonzero(top == loser))
+
+
+class Tally:
+    """Decoded ballot matrix of a ranked question with its cached rounds.
+
+    Rows are sorted by voter id. ``cursor`` is the time up to which saved
+    ballots have been applied.
+    """
+
+    def __init__(self, choice_ids, voters, rankings, cursor=None):
+        self.choice_ids = np.asarray(choice_ids, dtype=np.int64)
+        self.voters = np.asarray(voters, dtype=np.int64)
+        self.matrix = self.to_indexes(rankings)
+        self.cursor = cursor
+        self._rounds = None
+
+    @property
+    def width(self):
+        return len(self.choice_ids)
+
+    def to_indexes(self, rankings):
+        """Return ranking rows of choice ids as padded rows of choice indexes."""
+        if not self.width:
+            return np.zeros((0, 0), dtype=np.int16)
+        rankings = np.asarray(rankings, dtype=np.int64).reshape(-1, self.width)
+        indexes = np.searchsorted(self.choice_ids, rankings).clip(max=self.width - 1)
+        known = self.choice_ids[indexes] == rankings
+        return np.where(known, indexes, self.width).astype(np.int16)
+
+    def apply(self, voters, rankings):
+        """Add or replace the ballots of the voters, given sorted by voter id.
+
+        Return true if the matrix changed.
+        """
+        if not self.width or not len(voters):
+            return False
+        voters = np.asarray(voters, dtype=np.int64)
+        rows = self.to_indexes(rankings)
+        positions = np.searchsorted(self.voters, voters)
+        known = positions < len(self.voters)
+        known[known] = self.voters[positions[known]] == voters[known]
+        changed = not np.array_equal(self.matrix[positions[known]], rows[known])
+        self.matrix[positions[known]] = rows[known]
+        if not known.all():
+            new = ~known
+            self.voters = np.insert(self.voters, positions[new], voters[new])
+            self.matrix = np.insert(self.matrix, positions[new], rows[new], axis=0)
+            changed = True
+        if changed:
+            self._rounds = None
+        return changed
+
+    def rounds(self):
+        """Return the instant-runoff rounds with choice ids for winner and eliminated."""
+        if self._rounds is None:
+            self._rounds = [
+                Round(counts.tolist(),
+                      None if eliminated is None else int(self.choice_ids[eliminated]),
+                      None if winner is None else int(self.choice_ids[winner]))
+                for counts, eliminated, winner in instant_runoff(self.matrix, self.width)
+            ]
+        return self._rounds
+
+
+def _decode_ballots(ballots, width):
+    """Return the voter ids and the ranking matrix of (voter id, ranking blob) rows."""
+    size = width * RANKING_DTYPE.itemsize
+    voters = []
+    blobs = []
+    for voter_id, ranking in ballots:
+        voters.append(voter_id)
+        blobs.append(bytes(ranking)[:size].ljust(size, b'\0'))
+    return voters, np.frombuffer(b''.join(blobs), dtype=RANKING_DTYPE)
+
+
+def load_tally(question):
+    """Build the tally of the question from its stored ballots."""
+    cursor = timezone.now()
+    choice_ids = sorted(question.choice_set.values_list('id', flat=True))
+    ballots = RankedBallot.objects.filter(question=question).order_by('voter_id').values_list('voter_id', 'ranking')
+    voters, rankings = _decode_ballots(ballots, len(choice_ids))
+    return Tally(choice_ids, voters, rankings, cursor)
+
+
+def update_tally(question, tally):
+    """Apply the ballots saved since the cursor of the tally and return true if it changed."""
+    since = tally.cursor - CURSOR_OVERLAP
+    tally.cursor = timezone.now()
+    ballots = (RankedBallot.objects.filter(question=question, updated__gte=since)
+               .order_by('voter_id').values_list('voter_id', 'ranking'))
+    return tally.apply(*_decode_ballots(ballots, tally.width))
+
+
+def get_tally(question):
+    """Return the tally of the question, loading it on first use and applying new ballots after."""
+    tally = local_cache.get(question.id, 'tally')
+    if tally is None:
+        tally = load_tally(question)
+        local_cache.set(question.id, 'tally', tally, timeout=None)
+    else:
+        update_tally(question, tally)
+    tally.rounds()
+    return tally
+
+
+def invalidate_tally(question_id):
+    """Drop the local tally of the question; other workers drop theirs through the bus."""
+    local_cache.evict(question_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed_callback(sender, instance, **kwargs):
+    invalidate_tally(instance.question_id)
+
+
+@receiver(post_delete, sender=Question)
+def ranked_question_deleted_callback(sender, instance, **kwargs):
+    invalidate_tally(instance.id)
@@ -0,0 +1,171 @@
+"""Deferred work queue for non-essential work of the request path.
+
+Handlers are registered with :func:`task` and queued with :func:`enqueue`.
+The polls_worker command runs them in batches and deletes the task rows in
+the transaction of their handler. A failed task is retried with exponential
+backoff and moved to the dead-letter status after MAX_ATTEMPTS. With the
+POLLS_TASKS_EAGER setting tasks run at once instead.
+"""
+import datetime
+import logging
+import traceback
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import rollups
+from .models import DeferredTask
+
+log = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = datetime.timedelta(seconds=10)
+# Claimed tasks are not handed out again until the lease runs out, so the
+# tasks of a crashed worker are retried.
+LEASE = datetime.timedelta(minutes=5)
+
+_handlers = {}
+
+
+class LeaseLost(Exception):
+    """The lease of a claimed task ran out and another worker claimed it."""
+
+
+def task(batch=False):
+    """Register a task handler under its function name.
+
+    A batch handler is called once with the payloads of every claimed task
+    of its name, a normal handler once per payload with keyword arguments.
+    """
+    def register(func):
+        _handlers[func.__name__] = (func, batch)
+        return func
+    return register
+
+
+def enqueue(name, **payload):
+    """Queue a task, or run it at once if POLLS_TASKS_EAGER is set."""
+    if getattr(settings, 'POLLS_TASKS_EAGER', False):
+        _run(name, [payload])
+    else:
+        DeferredTask.objects.create(name=name, payload=payload)
+
+
+def _run(name, payloads):
+    func, batch = _handlers[name]
+    if batch:
+        func(payloads)
+    else:
+        for payload in payloads:
+            func(**payload)
+
+
+def claim(batch_size):
+    """Lease up to batch_size due tasks to this worker and return them.
+
+    The due tasks are leased with a conditional UPDATE that only matches rows
+    still due, so two workers never lease the same task even on databases
+    without row locks such as SQLite. The tasks actually leased are read back
+    by the token of this claim.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = DeferredTask.objects.filter(status=DeferredTask.PENDING, run_after__lte=now)
+    candidates = list(due.order_by('id').values_list('id', flat=True)[:batch_size])
+    if not due.filter(pk__in=candidates).update(run_after=now + LEASE, attempts=F('attempts') + 1,
+                                                claimed_by=token):
+        return []
+    return list(DeferredTask.objects.filter(claimed_by=token).order_by('id'))
+
+
+def fail(deferred, error):
+    """Schedule a retry of a failed task, or move it to the dead-letter status.
+
+    Nothing is changed if the lease of the task was lost.
+    """
+    deferred.last_error = error
+    if deferred.attempts >= MAX_ATTEMPTS:
+        deferred.status = DeferredTask.DEAD
+        log.error(f'Task {deferred.name} {deferred.pk} failed {deferred.attempts} times and is dead')
+    else:
+        deferred.run_after = timezone.now() + RETRY_DELAY * 2 ** (deferred.attempts - 1)
+    DeferredTask.objects.filter(pk=deferred.pk, claimed_by=deferred.claimed_by).update(
+        status=deferred.status, run_after=deferred.run_after, last_error=deferred.last_error)
+
+
+def _complete(group):
+    """Delete the task rows of the group, which must still be leased to this worker."""
+    deleted, _ = DeferredTask.objects.filter(
+        pk__in=[deferred.pk for deferred in group], claimed_by=group[0].claimed_by).delete()
+    if deleted != len(group):
+        raise LeaseLost
+
+
+def _run_group(name, group):
+    """Run the claimed tasks of one name and delete those that succeeded.
+
+    Each run deletes its task rows in the transaction of the handler, so the
+    handler's writes are never committed without the rows being gone. The
+    tasks run as one batch first. If that fails, every task runs again on
+    its own so only the tasks that raise are failed; tasks whose lease was
+    lost are left to the worker that holds it.
+    """
+    try:
+        with transaction.atomic():
+            _complete(group)
+            _run(name, [deferred.payload for deferred in group])
+        return
+    except LeaseLost:
+        pass
+    except Exception:
+        if len(group) == 1:
+            fail(group[0], traceback.format_exc())
+            return
+
+    for deferred in group:
+        try:
+            with transaction.atomic():
+                _complete([deferred])
+                _run(name, [deferred.payload])
+        except LeaseLost:
+            log.warning(f'Task {deferred.name} {deferred.pk} was claimed by another worker')
+        except Exception:
+            fail(deferred, traceback.format_exc())
+
+
+def run_pending(batch_size=100):
+    """Run one batch of due tasks and return the number of tasks claimed."""
+    claimed = claim(batch_size)
+    by_name = {}
+    for deferred in claimed:
+        by_name.setdefault(deferred.name, []).append(deferred)
+
+    for name, group in by_name.items():
+        if name not in _handlers:
+            for deferred in group:
+                fail(deferred, f'Unknown task: {name}')
+            continue
+        _run_group(name, group)
+    return len(claimed)
+
+
+@task(batch=True)
+def after_vote(payloads):
+    """Log votes and add them to the time-bucketed rollups, one increment per choice and minute.
+
+    Every payload holds the voter, ip, date and question_ids for the log line
+    and the vote time with its [question id, choice id, previous choice id]
+    votes for the rollups.
+    """
+    by_minute = {}
+    for payload in payloads:
+        log.info(f"Login user: {payload['voter']} Ip: {payload['ip']} Date: {payload['date']} "
+                 f"Question_Id: {', '.join(map(str, payload['question_ids']))}")
+        bucket = rollups.minute_bucket(parse_datetime(payload['when']))
+        by_minute.setdefault(bucket, []).extend(payload['votes'])
+    for bucket, votes in by_minute.items():
+        rollups.record_votes(votes, bucket)
@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from polls.models import ArchivedVotes, Question, Vote
+
+
+class ArchiveCommandTests(TestCase):
+    """Unittests for the polls_archive command."""
+
+    def setUp(self):
+        now = timezone.now()
+        self.closed = Question.objects.create(question_text="Closed?", pub_date=now - timezone.timedelta(days=2),
+                                              end_date=now - timezone.timedelta(days=1))
+        self.open = Question.objects.create(question_text="Open?", pub_date=now - timezone.timedelta(days=2))
+        self.voters = [User.objects.create_user(f"voter{i}", password="password") for i in range(5)]
+        yes = self.closed.choice_set.create(choice_text="Yes", votes=3)
+        no = self.closed.choice_set.create(choice_text="No", votes=2)
+        self.expected = {}
+        for voter, choice in zip(self.voters, [yes, no, yes, no, yes]):
+            Vote.objects.create(question=self.closed, choice=choice, voter=voter)
+            self.expected[voter.id] = choice.id
+        open_choice = self.open.choice_set.create(choice_text="Maybe", votes=1)
+        Vote.objects.create(question=self.open, choice=open_choice, voter=self.voters[0])
+
+    def test_archive_closed_question(self):
+        """Votes of closed questions move into the archive and leave the live table."""
+        call_command('polls_archive', stdout=StringIO())
+        self.assertFalse(Vote.objects.filter(question=self.closed).exists())
+        self.assertTrue(Vote.objects.filter(question=self.open).exists())
+        archive = ArchivedVotes.objects.get(question=self.closed)
+        self.assertEqual(len(archive), 5)
+        self.assertEqual(archive.unpack(), self.expected)
+
+    def test_lookup_by_voter(self):
+        """The archive answers which choice a voter picked, or None if they did not vote."""
+        call_command('polls_archive', stdout=StringIO())
+        archive = ArchivedVotes.objects.get(question=self.closed)
+        for voter_id, choice_id in self.expected.items():
+            self.assertEqual(archive.choice_id_for(voter_id), choice_id)
+        self.assertIsNone(archive.choice_id_for(max(self.expected) + 1))
+        self.assertIsNone(archive.choice_id_for(0))
+
+    def test_archive_merges_late_votes(self):
+        """Running the command again merges new rows into the existing archive."""
+        call_command('polls_archive', stdout=StringIO())
+        late_voter = User.objects.create_user("late", password="password")
+        choice = self.closed.choice_set.first()
+        Vote.objects.create(question=self.closed, choice=choice, voter=late_voter)
+        call_command('polls_archive', stdout=StringIO())
+        archive = ArchivedVotes.objects.get(question=self.closed)
+        self.assertEqual(len(archive), 6)
+        self.assertEqual(archive.choice_id_for(late_voter.id), choice.id)
+
+    def test_reopen_restores_votes(self):
+        """Reopening an archived question moves its votes back, so a returning voter re-votes."""
+        call_command('polls_archive', stdout=StringIO())
+        self.closed.end_date = timezone.now() + timezone.timedelta(days=1)
+        self.closed.save()
+        self.assertFalse(ArchivedVotes.objects.filter(question=self.closed).exists())
+        self.assertEqual(dict(Vote.objects.filter(question=self.closed).values_list('voter_id', 'choice_id')),
+                         self.expected)
+
+        yes, no = self.closed.choice_set.order_by('id')
+        self.client.force_login(self.voters[0])
+        self.client.post(reverse('polls:vote', args=(self.closed.id,)), {'choice': no.id})
+        yes.refresh_from_db()
+        no.refresh_from_db()
+        self.assertEqual((yes.votes, no.votes), (2, 3))
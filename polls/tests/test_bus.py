@@ -0,0 +1,90 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from polls import bus
+from polls.checks import check_shared_cache
+from polls.models import InvalidationEvent, Question
+
+
+class InvalidationBusTests(TestCase):
+    """Unittests for the cross-worker invalidation bus."""
+
+    def setUp(self):
+        bus.local_cache.clear()
+        self.question = Question.objects.create(question_text="Do you believe in gravity?",
+                                                pub_date=timezone.now())
+
+    def worker(self):
+        """Return a database transport polled without delay, as another worker would use."""
+        transport = bus.DatabaseTransport()
+        transport.poll_interval = 0
+        transport.receive()
+        return transport
+
+    def test_events_reach_other_workers(self):
+        """Events published by one worker are received by every other worker once."""
+        publisher, first, second = self.worker(), self.worker(), self.worker()
+        publisher.publish([self.question.id, None])
+        self.assertEqual(first.receive(), {self.question.id, None})
+        self.assertEqual(second.receive(), {self.question.id, None})
+        self.assertEqual(first.receive(), set())
+
+    def test_model_signals_evict_local_entries(self):
+        """Changing a choice evicts the local entries of its question only."""
+        bus.local_cache.set(self.question.id, 'data', 'stale')
+        bus.local_cache.set(None, 'shared', 'fresh')
+        self.question.choice_set.create(choice_text="Yes")
+        self.assertIsNone(bus.local_cache.get(self.question.id, 'data'))
+        self.assertEqual(bus.local_cache.get(None, 'shared'), 'fresh')
+
+    def test_poll_applies_remote_events(self):
+        """Polling evicts the entries named by events of other workers."""
+        transport = self.worker()
+        bus._transport, previous = transport, bus._transport
+        try:
+            bus.local_cache.set(self.question.id, 'data', 'stale')
+            InvalidationEvent.objects.create(question_id=self.question.id)
+            bus.poll()
+        finally:
+            bus._transport = previous
+        self.assertIsNone(bus.local_cache.get(self.question.id, 'data'))
+
+    def test_late_commit_below_cursor_is_received(self):
+        """An event that becomes visible after the cursor passed its id is still received once."""
+        transport = self.worker()
+        late = InvalidationEvent.objects.create(question_id=self.question.id)
+        InvalidationEvent.objects.create(question_id=None)
+        late_id = late.id
+        late.delete()
+        self.assertEqual(transport.receive(), {None})
+        InvalidationEvent.objects.create(id=late_id, question_id=self.question.id)
+        self.assertEqual(transport.receive(), {self.question.id})
+        self.assertEqual(transport.receive(), set())
+
+    def test_local_entries_expire(self):
+        """Local entries expire after their timeout, except those stored without one."""
+        bus.local_cache.set(self.question.id, 'data', 'stale', timeout=0)
+        bus.local_cache.set(self.question.id, 'versioned', 'kept', timeout=None)
+        self.assertIsNone(bus.local_cache.get(self.question.id, 'data'))
+        self.assertEqual(bus.local_cache.get(self.question.id, 'versioned'), 'kept')
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Unittests for the system check on the default cache."""
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                       POLLS_INVALIDATION_TRANSPORT='polls.bus.DatabaseTransport')
+    def test_process_local_cache_is_refused(self):
+        """A per-process cache behind the database transport is an error."""
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['polls.E001'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                       POLLS_INVALIDATION_TRANSPORT='polls.bus.LocalTransport')
+    def test_process_local_cache_for_single_process(self):
+        """A per-process cache is fine when the bus is limited to one process."""
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                           'LOCATION': 'polls_cache'}})
+    def test_shared_cache(self):
+        """A cache shared by all workers passes."""
+        self.assertEqual(check_shared_cache(None), [])
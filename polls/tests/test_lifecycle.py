@@ -0,0 +1,82 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from polls.bus import local_cache
+from polls.lifecycle import open_question_ids, questions_closed
+from polls.models import Question
+
+
+def create_question(question_text, days, end_days=None):
+    """Create a question published and optionally ended `days` offset to now."""
+    now = timezone.now()
+    end_date = None if end_days is None else now + datetime.timedelta(days=end_days)
+    return Question.objects.create(question_text=question_text,
+                                   pub_date=now + datetime.timedelta(days=days),
+                                   end_date=end_date)
+
+
+class OpenQuestionsTests(TestCase):
+    """Unittests for the precomputed open question set."""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def test_open_question_ids(self):
+        """Only published questions that have not ended are open."""
+        open_question = create_question("Open.", days=-1)
+        create_question("Future.", days=1)
+        create_question("Ended.", days=-2, end_days=-1)
+        self.assertEqual(open_question_ids(), {open_question.id})
+
+    def test_set_is_cached(self):
+        """A warm open set is served without querying the database."""
+        create_question("Open.", days=-1, end_days=1)
+        open_question_ids()
+        with self.assertNumQueries(0):
+            open_question_ids()
+
+    def test_question_save_invalidates_set(self):
+        """Saving a question rebuilds the set on the next lookup."""
+        question = create_question("Future.", days=1)
+        self.assertEqual(open_question_ids(), frozenset())
+        question.pub_date = timezone.now() - datetime.timedelta(days=1)
+        question.save()
+        self.assertEqual(open_question_ids(), {question.id})
+
+    def closed_reports(self, *steps):
+        """Run the steps and return the question ids reported by questions_closed."""
+        closed = []
+
+        def on_closed(sender, question_ids, **kwargs):
+            closed.extend(question_ids)
+        questions_closed.connect(on_closed)
+        try:
+            for step in steps:
+                step()
+        finally:
+            questions_closed.disconnect(on_closed)
+        return closed
+
+    def test_rebuild_at_boundary_sends_closed_signal(self):
+        """Passing an end_date rebuilds the set and reports the closed question once."""
+        question = create_question("Closing.", days=-1, end_days=1)
+        self.assertEqual(open_question_ids(), {question.id})
+        later = question.end_date + datetime.timedelta(seconds=30)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            closed = self.closed_reports(open_question_ids, open_question_ids)
+            self.assertEqual(open_question_ids(), frozenset())
+        self.assertEqual(closed, [question.id])
+
+    def test_unrelated_save_does_not_lose_closed_signal(self):
+        """A question saved after the boundary passed does not hide the closure."""
+        question = create_question("Closing.", days=-1, end_days=1)
+        other = create_question("Other.", days=-1)
+        open_question_ids()
+        later = question.end_date + datetime.timedelta(seconds=30)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            closed = self.closed_reports(other.save, open_question_ids)
+        self.assertEqual(closed, [question.id])
@@ -0,0 +1,14 @@
+import time
+
+from django.test import SimpleTestCase
+from mysite.preload import preload
+
+
+class PreloadTests(SimpleTestCase):
+    """Unittests for the worker preload hook."""
+
+    def test_preload_reports_step_timings(self):
+        """Preloading runs every warm-up step and reports how long each took."""
+        timings = preload(started=time.perf_counter(), caches=False)
+        self.assertEqual(set(timings), {'imports', 'urls', 'templates', 'startup'})
+        self.assertTrue(all(seconds >= 0 for seconds in timings.values()))
@@ -0,0 +1,91 @@
+import datetime
+from importlib import import_module
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from polls import rollups, tasks
+from polls.models import Question, VoteRollup
+
+
+class VoteRollupTests(TestCase):
+    """Unittests for time-bucketed vote rollups."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user("Mag", "joe@his.domain", "jotaro")
+        self.client.login(username="Mag", password="jotaro")
+        self.question = Question.objects.create(question_text="Do you believe in gravity?",
+                                                pub_date=timezone.now() - datetime.timedelta(days=1))
+        self.yes = self.question.choice_set.create(choice_text="Yes")
+        self.no = self.question.choice_set.create(choice_text="No")
+
+    def vote(self, choice):
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id})
+        tasks.run_pending()
+
+    def test_vote_increments_minute_bucket(self):
+        """A vote adds one to the current minute bucket of its choice."""
+        self.vote(self.yes)
+        rollup = VoteRollup.objects.get()
+        self.assertEqual((rollup.choice, rollup.resolution, rollup.count), (self.yes, VoteRollup.MINUTE, 1))
+        self.assertEqual(rollup.bucket.second, 0)
+
+    def test_revote_moves_count(self):
+        """A re-vote moves the count to the new choice, so totals stay consistent."""
+        self.vote(self.yes)
+        self.vote(self.no)
+        self.vote(self.no)
+        totals = {choice.id: 0 for choice in (self.yes, self.no)}
+        for point in rollups.series(self.question):
+            totals[point['choice']] += point['count']
+        self.assertEqual(totals, {self.yes.id: 0, self.no.id: 1})
+
+    def test_compact_merges_old_buckets(self):
+        """Old minute buckets are merged into hours and old hours into days."""
+        now = timezone.now()
+        for minutes in (0, 1, 2):
+            when = now - datetime.timedelta(days=2, minutes=minutes)
+            rollups.increment(self.question.id, self.yes.id, rollups.minute_bucket(when))
+        rollups.increment(self.question.id, self.no.id, now - datetime.timedelta(days=40),
+                          resolution=VoteRollup.HOUR)
+        rollups.increment(self.question.id, self.yes.id, rollups.minute_bucket(now))
+        rollups.compact(now)
+        self.assertEqual(VoteRollup.objects.filter(resolution=VoteRollup.MINUTE).count(), 1)
+        self.assertEqual(sum(VoteRollup.objects.filter(resolution=VoteRollup.HOUR).values_list('count', flat=True)), 3)
+        self.assertEqual(VoteRollup.objects.get(resolution=VoteRollup.DAY).choice, self.no)
+
+    def test_series_endpoint(self):
+        """The series endpoint serves the rollups summed to the requested resolution."""
+        self.vote(self.yes)
+        response = self.client.get(reverse('polls:results_series', args=(self.question.id,)),
+                                   {'resolution': 'day'})
+        data = response.json()
+        self.assertEqual(data['resolution'], 'day')
+        self.assertEqual([(point['choice'], point['count']) for point in data['series']], [(self.yes.id, 1)])
+        response = self.client.get(reverse('polls:results_series', args=(self.question.id,)),
+                                   {'resolution': 'week'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_backfill_covers_votes_from_before_rollups(self):
+        """The backfill migration adds the votes missing from the rollups ahead of later buckets."""
+        self.yes.votes = 3
+        self.yes.save()
+        self.vote(self.no)
+        self.vote(self.yes)
+        backfill = import_module('polls.migrations.0012_backfill_vote_rollups').backfill_rollups
+        backfill(django_apps, None)
+        totals = {}
+        running = {self.yes.id: 0, self.no.id: 0}
+        for point in rollups.series(self.question, VoteRollup.DAY):
+            running[point['choice']] += point['count']
+            self.assertGreaterEqual(running[point['choice']], 0)
+        for choice in (self.yes, self.no):
+            choice.refresh_from_db()
+            totals[choice.id] = choice.votes
+        self.assertEqual(running, totals)
+        backfill(django_apps, None)
+        self.assertEqual(VoteRollup.objects.filter(resolution=VoteRollup.DAY).count(), 1)
@@ -0,0 +1,51 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+from polls import throttle
+from polls.lifecycle import open_question_ids
+from polls.models import Choice, Question, Vote, VoteRollup
+
+
+class SeedCommandTests(TestCase):
+    """Unittests for the polls_seed command."""
+
+    def seed(self, seed=0):
+        call_command('polls_seed', '--clear', questions=20, choices=3, users=50, votes=400, seed=seed,
+                     chunk_size=64, stdout=StringIO())
+
+    def signature(self):
+        """Return the seeded votes independent of database ids."""
+        return sorted(Vote.objects.values_list('question__question_text', 'choice__choice_text', 'voter__username'))
+
+    def test_seed_creates_consistent_dataset(self):
+        """Seeding creates the requested rows with counters and rollups matching the votes."""
+        self.seed()
+        self.assertEqual(Question.objects.count(), 20)
+        self.assertEqual(Choice.objects.count(), 60)
+        self.assertEqual(Vote.objects.count(), 400)
+        self.assertFalse(Vote.objects.values('question', 'voter').annotate(n=Count('id')).filter(n__gt=1).exists())
+        for choice in Choice.objects.annotate(counted=Count('vote')):
+            self.assertEqual(choice.votes, choice.counted)
+        self.assertEqual(VoteRollup.objects.aggregate(total=Sum('count'))['total'], 400)
+
+    def test_seed_is_deterministic(self):
+        """The same seed produces the same votes, a different seed different ones."""
+        self.seed()
+        first = self.signature()
+        self.seed()
+        self.assertEqual(self.signature(), first)
+        self.seed(seed=1)
+        self.assertNotEqual(self.signature(), first)
+
+    def test_seed_keeps_unrelated_cache_entries(self):
+        """Seeding refreshes the open question set but keeps other cache entries like login locks."""
+        cache.clear()
+        self.assertEqual(open_question_ids(), frozenset())
+        for _ in range(10):
+            throttle.record_failure("someone", None)
+        self.seed()
+        self.assertTrue(throttle.is_locked("someone", None))
+        self.assertTrue(open_question_ids())
@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from polls.models import Choice, Question, Vote
+from polls import survey
+from polls.survey import submit_survey
+from polls.user_votes import user_votes
+
+
+class SurveyTests(TestCase):
+    """Unittests for the batch survey vote endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.voter = User.objects.create_user("Mag", "joe@his.domain", "jotaro")
+        self.client.login(username="Mag", password="jotaro")
+        self.questions = []
+        for number in range(6):
+            question = Question.objects.create(question_text=f"Question {number}?",
+                                               pub_date=timezone.now() - timezone.timedelta(days=1))
+            question.choice_set.create(choice_text="Yes")
+            question.choice_set.create(choice_text="No")
+            self.questions.append(question)
+
+    def answers(self, questions, choice_text):
+        return {f'choice_{question.id}': question.choice_set.get(choice_text=choice_text).id
+                for question in questions}
+
+    def test_survey_stores_votes_and_counters(self):
+        """Every answered question gets a vote and its choice counter is incremented."""
+        response = self.client.post(reverse('polls:survey'), self.answers(self.questions[:3], "Yes"))
+        self.assertRedirects(response, reverse('polls:index'))
+        self.assertEqual(Vote.objects.filter(voter=self.voter).count(), 3)
+        self.assertEqual(list(Choice.objects.filter(votes=1).values_list('question_id', flat=True).order_by('id')),
+                         [question.id for question in self.questions[:3]])
+
+    def test_survey_revote_moves_counters(self):
+        """Answering again moves the counters from the old choices to the new ones."""
+        self.client.post(reverse('polls:survey'), self.answers(self.questions[:2], "Yes"))
+        self.client.post(reverse('polls:survey'), self.answers(self.questions[:2], "No"))
+        for question in self.questions[:2]:
+            self.assertEqual(dict(question.choice_set.values_list('choice_text', 'votes')), {"Yes": 0, "No": 1})
+            self.assertEqual(Vote.objects.get(question=question).choice.choice_text, "No")
+
+    def test_closed_question_rejects_whole_survey(self):
+        """A selection for a closed question rejects the survey without storing anything."""
+        closed = self.questions[0]
+        closed.end_date = timezone.now() - timezone.timedelta(seconds=1)
+        closed.save()
+        response = self.client.post(reverse('polls:survey'), self.answers(self.questions[:2], "Yes"))
+        self.assertContains(response, "Please select one choice")
+        self.assertFalse(Vote.objects.exists())
+
+    def test_vote_queries_do_not_grow_with_questions(self):
+        """The number of Vote queries is the same for two and six answered questions."""
+        def vote_queries(questions):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(reverse('polls:survey'), self.answers(questions, "Yes"))
+            return len([query for query in queries if 'polls_vote"' in query['sql']])
+        self.assertEqual(vote_queries(self.questions[:2]), vote_queries(self.questions[2:]))
+
+    def test_concurrent_submission_does_not_duplicate_votes(self):
+        """A vote inserted after the survey read the existing ones is updated instead of duplicated."""
+        question = self.questions[0]
+        yes, no = question.choice_set.get(choice_text="Yes"), question.choice_set.get(choice_text="No")
+        submit_survey(self.voter, {question.id: yes.id})
+        # The first read misses the vote, as if it was committed right after.
+        reads = [{}, survey._existing_votes(self.voter, [question.id])]
+        with mock.patch.object(survey, '_existing_votes', side_effect=reads) as existing_votes:
+            submit_survey(self.voter, {question.id: no.id})
+        self.assertEqual(existing_votes.call_count, 2)
+        self.assertEqual(Vote.objects.get(question=question, voter=self.voter).choice, no)
+        self.assertEqual(dict(question.choice_set.values_list('choice_text', 'votes')), {"Yes": 0, "No": 1})
+
+    def test_duplicate_vote_is_rejected(self):
+        """The database refuses a second vote of the same voter on a question."""
+        question = self.questions[0]
+        choice = question.choice_set.first()
+        Vote.objects.create(question=question, choice=choice, voter=self.voter)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(question=question, choice=choice, voter=self.voter)
+
+
+class SurveyCommitTests(TransactionTestCase):
+    """Unittests for the cache updates of a survey, which wait for the commit."""
+
+    def setUp(self):
+        cache.clear()
+        self.voter = User.objects.create_user("Mag", "joe@his.domain", "jotaro")
+        self.question = Question.objects.create(question_text="Question?",
+                                                pub_date=timezone.now() - timezone.timedelta(days=1))
+        self.choice = self.question.choice_set.create(choice_text="Yes")
+
+    def test_rolled_back_survey_leaves_cached_votes(self):
+        """A survey whose transaction rolls back does not show up in the user's cached votes."""
+        self.assertEqual(user_votes(self.voter), {})
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            submit_survey(self.voter, {self.question.id: self.choice.id})
+            raise RuntimeError
+        self.assertEqual(user_votes(self.voter), {})
+        submit_survey(self.voter, {self.question.id: self.choice.id})
+        self.assertEqual(user_votes(self.voter), {self.question.id: self.choice.id})
@@ -0,0 +1,128 @@
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from django.urls import reverse
+from polls.bus import local_cache
+from polls.models import Question, RankedBallot
+from polls.tally import get_tally, instant_runoff, load_tally
+
+NONE = 3
+
+
+class InstantRunoffTests(TestCase):
+    """Unittests for the instant-runoff tally engine."""
+
+    def test_majority_in_first_round(self):
+        """A choice with a majority of first preferences wins at once."""
+        matrix = np.array([[0, 1, NONE], [0, 2, NONE], [1, 0, NONE]], dtype=np.int16)
+        rounds = instant_runoff(matrix, 3)
+        self.assertEqual(len(rounds), 1)
+        self.assertEqual(rounds[0].counts.tolist(), [2, 1, 0])
+        self.assertEqual(rounds[0].winner, 0)
+
+    def test_votes_transfer_after_elimination(self):
+        """Ballots of an eliminated choice move to their next preference."""
+        matrix = np.array([
+            [0, NONE, NONE], [0, NONE, NONE],
+            [1, NONE, NONE], [1, NONE, NONE],
+            [2, 1, NONE],
+        ], dtype=np.int16)
+        rounds = instant_runoff(matrix, 3)
+        self.assertEqual([r.eliminated for r in rounds], [2, None])
+        self.assertEqual(rounds[1].counts.tolist(), [2, 3, 0])
+        self.assertEqual(rounds[1].winner, 1)
+
+    def test_exhausted_ballots_are_dropped(self):
+        """Ballots without a remaining preference no longer count."""
+        matrix = np.array([
+            [0, NONE, NONE], [0, NONE, NONE],
+            [1, NONE, NONE], [1, NONE, NONE], [1, NONE, NONE],
+            [2, NONE, NONE], [2, 0, NONE],
+        ], dtype=np.int16)
+        rounds = instant_runoff(matrix, 3)
+        self.assertEqual(rounds[0].eliminated, 0)
+        self.assertEqual(rounds[1].counts.tolist(), [0, 3, 2])
+        self.assertEqual(rounds[1].winner, 1)
+
+    def test_no_ballots(self):
+        """Without ballots there is one empty round and no winner."""
+        rounds = instant_runoff(np.zeros((0, 3), dtype=np.int16), 3)
+        self.assertEqual(len(rounds), 1)
+        self.assertIsNone(rounds[0].winner)
+
+
+class RankedVoteTests(TestCase):
+    """Unittests for voting on ranked-choice questions."""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.voter = User.objects.create_user("Mag", "joe@his.domain", "jotaro")
+        self.client.login(username="Mag", password="jotaro")
+        self.question = Question.objects.create(question_text="Best fruit?", ranked=True,
+                                                pub_date=timezone.now() - timezone.timedelta(days=1))
+        self.choices = [self.question.choice_set.create(choice_text=text) for text in ["Apple", "Banana", "Cherry"]]
+
+    def test_ranked_vote_stores_ballot(self):
+        """A ranked vote stores the choices in order of preference."""
+        apple, banana, cherry = self.choices
+        response = self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                                    {f'rank_{cherry.id}': '1', f'rank_{apple.id}': '2'})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        ballot = RankedBallot.objects.get(question=self.question, voter=self.voter)
+        self.assertEqual(ballot.get_ranking(), [cherry.id, apple.id])
+
+    def test_duplicate_rank_is_rejected(self):
+        """Two choices with the same rank are rejected."""
+        apple, banana, cherry = self.choices
+        response = self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                                    {f'rank_{apple.id}': '1', f'rank_{banana.id}': '1'})
+        self.assertContains(response, "distinct numbers")
+        self.assertFalse(RankedBallot.objects.exists())
+
+    def test_cached_tally_follows_new_ballots(self):
+        """The cached tally is updated in place and matches a fresh rebuild."""
+        apple, banana, cherry = self.choices
+        get_tally(self.question)
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {f'rank_{banana.id}': '1'})
+        self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                         {f'rank_{apple.id}': '1', f'rank_{banana.id}': '2'})
+        cached = get_tally(self.question)
+        self.assertEqual(cached.rounds(), load_tally(self.question).rounds())
+        self.assertEqual(cached.rounds()[0].winner, apple.id)
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, "Apple wins")
+
+    def test_gaps_in_ranks_are_rejected(self):
+        """Ranks must be the numbers 1 to n without gaps."""
+        apple, banana, cherry = self.choices
+        response = self.client.post(reverse('polls:vote', args=(self.question.id,)),
+                                    {f'rank_{apple.id}': '1', f'rank_{banana.id}': '5'})
+        self.assertContains(response, "distinct numbers")
+        self.assertFalse(RankedBallot.objects.exists())
+
+    def test_ballots_of_other_workers_are_applied_as_delta(self):
+        """Ballots saved elsewhere are applied to the local tally without reloading it."""
+        apple, banana, cherry = self.choices
+        tally = get_tally(self.question)
+        for number, ranking in enumerate([[cherry.id], [banana.id, cherry.id], [cherry.id, apple.id]]):
+            ballot = RankedBallot(question=self.question,
+                                  voter=User.objects.create_user(f"Other{number}", password="password"))
+            ballot.set_ranking(ranking)
+            ballot.save()
+        with self.assertNumQueries(1):
+            cached = get_tally(self.question)
+        self.assertIs(cached, tally)
+        self.assertEqual(cached.rounds(), load_tally(self.question).rounds())
+        self.assertEqual(cached.rounds()[0].winner, cherry.id)
+
+    def test_deleted_ballot_drops_tally(self):
+        """Deleting a ballot makes the next lookup reload the tally."""
+        apple, banana, cherry = self.choices
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {f'rank_{banana.id}': '1'})
+        self.assertEqual(sum(get_tally(self.question).rounds()[0].counts), 1)
+        RankedBallot.objects.all().delete()
+        self.assertEqual(sum(get_tally(self.question).rounds()[0].counts), 0)
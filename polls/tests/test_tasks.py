@@ -0,0 +1,140 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from polls import tasks
+from polls.models import DeferredTask, Question, VoteRollup
+
+calls = []
+
+
+@tasks.task()
+def record_call(value):
+    calls.append(value)
+
+
+@tasks.task()
+def always_fail():
+    raise RuntimeError("broken")
+
+
+@tasks.task()
+def record_pending(value):
+    calls.append((value, DeferredTask.objects.filter(payload__value=value).exists()))
+
+
+@tasks.task(batch=True)
+def record_batch(payloads):
+    if any(payload['value'] is None for payload in payloads):
+        raise RuntimeError("poison")
+    calls.extend(payload['value'] for payload in payloads)
+
+
+class DeferredTaskTests(TestCase):
+    """Unittests for the deferred task queue."""
+
+    def setUp(self):
+        cache.clear()
+        calls.clear()
+
+    def test_enqueue_defers_until_worker_runs(self):
+        """Queued tasks only run when the worker processes them, and are then removed."""
+        tasks.enqueue('record_call', value=1)
+        tasks.enqueue('record_call', value=2)
+        self.assertEqual(calls, [])
+        self.assertEqual(tasks.run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(DeferredTask.objects.exists())
+
+    @override_settings(POLLS_TASKS_EAGER=True)
+    def test_eager_runs_at_once(self):
+        """With POLLS_TASKS_EAGER the task runs inside enqueue."""
+        tasks.enqueue('record_call', value=3)
+        self.assertEqual(calls, [3])
+        self.assertFalse(DeferredTask.objects.exists())
+
+    def test_failed_task_is_retried_then_dead(self):
+        """A failing task backs off between attempts and ends in the dead-letter list."""
+        tasks.enqueue('always_fail')
+        tasks.run_pending()
+        deferred = DeferredTask.objects.get()
+        self.assertEqual((deferred.status, deferred.attempts), (DeferredTask.PENDING, 1))
+        self.assertGreater(deferred.run_after, timezone.now())
+        self.assertIn("broken", deferred.last_error)
+        for _ in range(tasks.MAX_ATTEMPTS - 1):
+            DeferredTask.objects.update(run_after=timezone.now())
+            tasks.run_pending()
+        deferred.refresh_from_db()
+        self.assertEqual((deferred.status, deferred.attempts), (DeferredTask.DEAD, tasks.MAX_ATTEMPTS))
+        DeferredTask.objects.update(run_after=timezone.now())
+        self.assertEqual(tasks.run_pending(), 0)
+
+    def test_vote_defers_rollups(self):
+        """The vote request queues its rollups instead of writing them."""
+        User.objects.create_user("Mag", "joe@his.domain", "jotaro")
+        self.client.login(username="Mag", password="jotaro")
+        question = Question.objects.create(question_text="Do you believe in gravity?",
+                                           pub_date=timezone.now() - timezone.timedelta(days=1))
+        choice = question.choice_set.create(choice_text="Yes")
+        self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': choice.id})
+        self.assertFalse(VoteRollup.objects.exists())
+        self.assertEqual(DeferredTask.objects.get().name, 'after_vote')
+        tasks.run_pending()
+        self.assertEqual(VoteRollup.objects.get().count, 1)
+
+    def test_poison_task_does_not_fail_its_batch(self):
+        """When a batch fails its tasks run one by one, and only the failing task is retried."""
+        tasks.enqueue('record_batch', value=1)
+        tasks.enqueue('record_batch', value=None)
+        tasks.enqueue('record_batch', value=2)
+        tasks.run_pending()
+        self.assertEqual(calls, [1, 2])
+        deferred = DeferredTask.objects.get()
+        self.assertEqual((deferred.payload, deferred.attempts), ({'value': None}, 1))
+        self.assertIn("poison", deferred.last_error)
+
+    def test_rollups_skip_deleted_question(self):
+        """Votes of a deleted question are dropped without losing the rollups of other votes."""
+        User.objects.create_user("Mag", "joe@his.domain", "jotaro")
+        self.client.login(username="Mag", password="jotaro")
+        questions = [Question.objects.create(question_text=f"Question {number}?",
+                                             pub_date=timezone.now() - timezone.timedelta(days=1))
+                     for number in range(2)]
+        choices = [question.choice_set.create(choice_text="Yes") for question in questions]
+        for question, choice in zip(questions, choices):
+            self.client.post(reverse('polls:vote', args=(question.id,)), {'choice': choice.id})
+        questions[0].delete()
+        tasks.run_pending()
+        self.assertEqual(list(VoteRollup.objects.values_list('choice_id', 'count')), [(choices[1].id, 1)])
+        self.assertFalse(DeferredTask.objects.exists())
+
+    def test_task_row_is_deleted_with_handler(self):
+        """The task row is already gone inside the transaction of its handler."""
+        tasks.enqueue('record_pending', value=1)
+        tasks.run_pending()
+        self.assertEqual(calls, [(1, False)])
+
+    def test_claimed_tasks_are_not_claimed_again(self):
+        """A second worker does not claim tasks leased by the first."""
+        for value in range(3):
+            tasks.enqueue('record_call', value=value)
+        first = tasks.claim(2)
+        self.assertEqual([deferred.payload['value'] for deferred in first], [0, 1])
+        self.assertEqual([deferred.payload['value'] for deferred in tasks.claim(10)], [2])
+        self.assertEqual(tasks.claim(10), [])
+
+    def test_lost_lease_is_not_run(self):
+        """A worker whose lease ran out leaves the task to the worker that claimed it next."""
+        tasks.enqueue('record_call', value=1)
+        first = tasks.claim(10)
+        DeferredTask.objects.update(run_after=timezone.now())
+        second = tasks.claim(10)
+        tasks._run_group('record_call', first)
+        self.assertEqual(calls, [])
+        self.assertEqual(DeferredTask.objects.get().claimed_by, second[0].claimed_by)
+        tasks.fail(first[0], "late")
+        self.assertEqual(DeferredTask.objects.get().last_error, "")
+        tasks._run_group('record_call', second)
+        self.assertEqual(calls, [1])
+        self.assertFalse(DeferredTask.objects.exists())
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls import throttle
+
+
+@override_settings(LOGIN_THROTTLE_THRESHOLD=3, LOGIN_THROTTLE_LOCKOUT=30, LOGIN_THROTTLE_MAX_LOCKOUT=3600)
+class LoginThrottleTests(TestCase):
+    """Unittests for the login throttle."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user("Yohn", "warrick@niflheim.realm", "monkey123")
+
+    def fail_logins(self, times):
+        for _ in range(times):
+            self.client.login(username="Yohn", password="wrong")
+
+    def test_locked_login_skips_password_hashing(self):
+        """Once the threshold is reached even the right password is rejected without hashing."""
+        self.fail_logins(3)
+        with mock.patch('django.contrib.auth.models.User.check_password') as check_password:
+            self.assertFalse(self.client.login(username="Yohn", password="monkey123"))
+        check_password.assert_not_called()
+
+    def test_successful_login_resets_failures(self):
+        """A successful login below the threshold forgets earlier failures."""
+        self.fail_logins(2)
+        self.assertTrue(self.client.login(username="Yohn", password="monkey123"))
+        self.fail_logins(2)
+        self.assertFalse(throttle.is_locked("Yohn", None))
+
+    def test_client_ip_is_throttled(self):
+        """Failures from one IP lock out that IP for every username."""
+        for _ in range(3):
+            self.client.post(reverse('login'), {'username': 'someone', 'password': 'wrong'},
+                             REMOTE_ADDR='10.0.0.1')
+        self.assertTrue(throttle.is_locked('another', '10.0.0.1'))
+        self.assertFalse(throttle.is_locked('another', '10.0.0.2'))
+
+    def test_lockout_doubles(self):
+        """Every failure past the threshold doubles the lockout, up to the maximum."""
+        self.assertEqual(throttle.lockout_seconds(2), 0)
+        self.assertEqual(throttle.lockout_seconds(3), 30)
+        self.assertEqual(throttle.lockout_seconds(5), 120)
+        self.assertEqual(throttle.lockout_seconds(100), 3600)
+
+    def test_counter_evicted_between_add_and_incr(self):
+        """A failure counter evicted right after it was added starts over instead of failing the login."""
+        with mock.patch.object(cache, 'incr', side_effect=ValueError):
+            throttle.record_failure("Yohn", "10.0.0.1")
+        self.assertEqual(cache.get('polls:login_failures:user:Yohn'), 1)
+
+    def test_spoofed_forwarded_for_is_ignored(self):
+        """Without trusted proxies a client cannot dodge the IP lockout by setting X-Forwarded-For."""
+        for attempt in range(3):
+            self.client.post(reverse('login'), {'username': 'someone', 'password': 'wrong'},
+                             REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{attempt}')
+        self.assertTrue(throttle.is_locked('another', '10.0.0.1'))
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_forwarded_for_of_trusted_proxy(self):
+        """With one trusted proxy the client is the address that proxy appended."""
+        for _ in range(3):
+            self.client.post(reverse('login'), {'username': 'someone', 'password': 'wrong'},
+                             REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.0.2.1, 10.0.0.2')
+        self.assertTrue(throttle.is_locked('another', '10.0.0.2'))
+        self.assertFalse(throttle.is_locked('another', '192.0.2.1'))
@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from polls.models import ArchivedVotes, Question, Vote
+from polls.user_votes import user_votes
+
+
+class UserVotesTests(TestCase):
+    """Unittests for the per-user voted question cache."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user("Mag", "joe@his.domain", "jotaro")
+        self.client.login(username="Mag", password="jotaro")
+        self.question = Question.objects.create(question_text="Do you believe in gravity?",
+                                                pub_date=timezone.now() - timezone.timedelta(days=1))
+        self.yes = self.question.choice_set.create(choice_text="Yes")
+        self.no = self.question.choice_set.create(choice_text="No")
+
+    def test_detail_marks_previous_choice(self):
+        """After a vote the detail page marks the selected choice and offers a re-vote."""
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.no.id})
+        response = self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.context['prev_choice'], self.no.id)
+        self.assertContains(response, "(previously selected)", count=1)
+        self.assertContains(response, "Re-Vote")
+
+    def test_index_shows_voted_badge(self):
+        """The index marks the questions the user voted on."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertNotContains(response, "(voted)")
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.yes.id})
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "(voted)")
+
+    def test_warm_pages_do_not_query_votes(self):
+        """Once warm, the detail and index pages run no Vote queries."""
+        self.client.get(reverse('polls:index'))
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.yes.id})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('polls:index'))
+            self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertFalse([query for query in queries if 'polls_vote' in query['sql']])
+
+    def test_archived_question_keeps_voted_badge(self):
+        """Votes moved into the archive still mark the question as voted."""
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.no.id})
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now())
+        call_command('polls_archive', stdout=StringIO())
+        self.assertTrue(ArchivedVotes.objects.filter(question=self.question).exists())
+        cache.clear()
+        response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "(voted)")
+        self.assertEqual(response.context['voted_question_ids'], {self.question.id: self.no.id})
+
+    def test_cold_load_reads_only_the_users_archives(self):
+        """The cold load reads the archives of the user's questions, not every archive."""
+        other = Question.objects.create(question_text="Not voted?",
+                                        pub_date=timezone.now() - timezone.timedelta(days=1))
+        other.choice_set.create(choice_text="Yes")
+        other_voter = User.objects.create_user("Other", password="password")
+        Vote.objects.create(question=other, choice=other.choice_set.get(), voter=other_voter)
+        self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': self.no.id})
+        Question.objects.update(end_date=timezone.now())
+        call_command('polls_archive', stdout=StringIO())
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            votes = user_votes(User.objects.get(username="Mag"))
+        self.assertEqual(votes, {self.question.id: self.no.id})
+        archive_queries = [query['sql'] for query in queries if 'polls_archivedvotes' in query['sql']]
+        self.assertEqual(len(archive_queries), 1)
+        self.assertIn('IN', archive_queries[0])
+
+
+class UserVotesInvalidationTests(TransactionTestCase):
+    """Unittests for dropping cached mappings when votes are deleted with their choice or question."""
+
+    def setUp(self):
+        cache.clear()
+        self.voter = User.objects.create_user("Mag", "joe@his.domain", "jotaro")
+        self.question = Question.objects.create(question_text="Do you believe in gravity?",
+                                                pub_date=timezone.now() - timezone.timedelta(days=1))
+        self.yes = self.question.choice_set.create(choice_text="Yes")
+        Vote.objects.create(question=self.question, choice=self.yes, voter=self.voter)
+
+    def test_choice_delete_drops_mapping(self):
+        """Deleting the voted choice removes the question from the cached mapping."""
+        self.assertEqual(user_votes(self.voter), {self.question.id: self.yes.id})
+        self.yes.delete()
+        self.assertEqual(user_votes(self.voter), {})
+
+    def test_question_delete_drops_mapping(self):
+        """Deleting the question removes it from the cached mapping."""
+        self.assertEqual(user_votes(self.voter), {self.question.id: self.yes.id})
+        self.question.delete()
+        self.assertEqual(user_votes(self.voter), {})
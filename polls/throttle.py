@@ -0,0 +1,51 @@
+"""Cache-backed throttling of failed logins per username and client IP.
+
+The counters and locks must live in a cache shared by every worker that
+does not cull entries under pressure (memcached or Redis with enough
+memory, not the per-process LocMemCache), otherwise a burst of failures
+across many usernames or IPs evicts the very locks that should stop it.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _keys(username, ip):
+    """Yield the (failure key, lock key) pair of every throttled identity."""
+    if username:
+        yield f'polls:login_failures:user:{username}', f'polls:login_lock:user:{username}'
+    if ip:
+        yield f'polls:login_failures:ip:{ip}', f'polls:login_lock:ip:{ip}'
+
+
+def is_locked(username, ip):
+    """Return true if logins for the username or from the IP are locked out."""
+    lock_keys = [lock_key for _, lock_key in _keys(username, ip)]
+    return bool(lock_keys) and bool(cache.get_many(lock_keys))
+
+
+def lockout_seconds(failures):
+    """Return the lockout after the given number of failures, doubling past the threshold."""
+    if failures < settings.LOGIN_THROTTLE_THRESHOLD:
+        return 0
+    exponent = min(failures - settings.LOGIN_THROTTLE_THRESHOLD, 32)
+    return min(settings.LOGIN_THROTTLE_LOCKOUT * 2 ** exponent, settings.LOGIN_THROTTLE_MAX_LOCKOUT)
+
+
+def record_failure(username, ip):
+    """Count a failed login and lock out identities that reached the threshold."""
+    for failure_key, lock_key in _keys(username, ip):
+        cache.add(failure_key, 0, settings.LOGIN_THROTTLE_WINDOW)
+        try:
+            failures = cache.incr(failure_key)
+        except ValueError:  # evicted since the add
+            failures = 1
+            cache.set(failure_key, failures, settings.LOGIN_THROTTLE_WINDOW)
+        cache.touch(failure_key, settings.LOGIN_THROTTLE_WINDOW)
+        lockout = lockout_seconds(failures)
+        if lockout:
+            cache.set(lock_key, True, lockout)
+
+
+def reset(username):
+    """Forget the failed logins of the username after a successful login."""
+    cache.delete_many([key for pair in _keys(username, None) for key in pair])
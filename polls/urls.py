@@ -7,7 +7,9 @@ urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     path('<int:pk>/', views.DetailView.as_view(), name='detail'),
     path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
+    path('<int:pk>/results/series/', views.results_series, name='results_series'),
     path('<int:question_id>/vote/', views.vote, name='vote'),
+    path('survey/', views.survey, name='survey'),
 ]
 # urlpatterns = [
 #     path('', views.index, name='index'),
@@ -0,0 +1,87 @@
+"""Per-user cache of the choice voted for each question."""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import ArchivedVoterIndex, ArchivedVotes, Choice, Question, RankedBallot, Vote
+
+# Bump when the layout of the cached mapping changes.
+USER_VOTES_VERSION = 1
+# Write-throughs keep the mapping current; the timeout bounds how long a
+# change that was missed can show.
+USER_VOTES_TIMEOUT = 60 * 60
+
+
+def _user_votes_key(user_id):
+    return f'polls:user_votes:{user_id}'
+
+
+def user_votes(user):
+    """Return a mapping of question id to the id of the choice the user voted.
+
+    Ranked-choice questions map to the first preference of the ballot, and
+    questions archived by polls_archive are looked up in the archives listed
+    by the user's ArchivedVoterIndex. The mapping is loaded on first use and
+    served from the cache afterwards. Anonymous users have no votes.
+    """
+    if not user.is_authenticated:
+        return {}
+    votes = cache.get(_user_votes_key(user.pk), version=USER_VOTES_VERSION)
+    if votes is None:
+        votes = {}
+        index = ArchivedVoterIndex.objects.filter(voter=user).first()
+        archived_ids = index.get_question_ids() if index else []
+        for archive in ArchivedVotes.objects.filter(question_id__in=archived_ids):
+            choice_id = archive.choice_id_for(user.pk)
+            if choice_id is not None:
+                votes[archive.question_id] = choice_id
+        votes.update(Vote.objects.filter(voter=user).values_list('question_id', 'choice_id'))
+        for ballot in RankedBallot.objects.filter(voter=user).only('question_id', 'ranking'):
+            votes[ballot.question_id] = ballot.get_ranking()[0]
+        cache.set(_user_votes_key(user.pk), votes, USER_VOTES_TIMEOUT, version=USER_VOTES_VERSION)
+    return votes
+
+
+def record_user_vote(user, question_id, choice_id):
+    """Write a vote through to the cached mapping of the user."""
+    record_user_votes(user, {question_id: choice_id})
+
+
+def record_user_votes(user, votes):
+    """Write a mapping of question id to choice id through to the cached mapping of the user."""
+    cached = cache.get(_user_votes_key(user.pk), version=USER_VOTES_VERSION)
+    if cached is not None:
+        cached.update(votes)
+        cache.set(_user_votes_key(user.pk), cached, USER_VOTES_TIMEOUT, version=USER_VOTES_VERSION)
+
+
+def invalidate_user_votes(user_ids):
+    """Drop the cached mappings of the users with the given ids."""
+    cache.delete_many([_user_votes_key(user_id) for user_id in user_ids], version=USER_VOTES_VERSION)
+
+
+def _invalidate_on_commit(voter_ids):
+    voter_ids = set(voter_ids) - {None}
+    if voter_ids:
+        transaction.on_commit(lambda: invalidate_user_votes(voter_ids))
+
+
+# Votes are only deleted through these cascades and by polls_archive, which
+# keeps them reachable through the archive. A receiver on Vote itself would
+# stop Django from deleting the votes of a question in bulk.
+@receiver(pre_delete, sender=Question)
+def question_deleted_callback(sender, instance, **kwargs):
+    voter_ids = list(Vote.objects.filter(question=instance).values_list('voter_id', flat=True))
+    voter_ids += RankedBallot.objects.filter(question=instance).values_list('voter_id', flat=True)
+    archive = ArchivedVotes.objects.filter(question=instance).first()
+    if archive is not None:
+        voter_ids += archive.unpack()
+    _invalidate_on_commit(voter_ids)
+
+
+@receiver(pre_delete, sender=Choice)
+def choice_deleted_callback(sender, instance, **kwargs):
+    voter_ids = list(Vote.objects.filter(choice=instance).values_list('voter_id', flat=True))
+    voter_ids += RankedBallot.objects.filter(question_id=instance.question_id).values_list('voter_id', flat=True)
+    _invalidate_on_commit(voter_ids)
@@ -0,0 +1,19 @@
+"""Helpers shared by the views and the authentication backend."""
+from django.conf import settings
+
+
+def get_client_ip(request):
+    """Return the IP address of the client that sent the request, or None without a request.
+
+    X-Forwarded-For is set by the client, so it is only trusted when the
+    TRUSTED_PROXY_COUNT setting says that many proxies in front of the site
+    append to it; the client is then the address added by the outermost one.
+    """
+    if request is None:
+        return None
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    if proxies:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR')
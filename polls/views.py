@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import reverse
 from django.views import generic
 from django.utils import timezone
@@ -12,15 +12,13 @@ from django.dispatch import receiver
 from datetime import datetime
 import logging
 
-from .models import Choice, Question, Vote
-
-def get_client_ip(request):
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+from . import rollups, tasks, throttle
+from .lifecycle import is_open, open_question_ids
+from .models import Choice, Question, RankedBallot, Vote, VoteRollup
+from .survey import selections_from_post, submit_survey, validate_selections
+from .tally import get_tally
+from .user_votes import record_user_vote, user_votes
+from .utils import get_client_ip
 
 log = logging.getLogger(__name__)
 
@@ -30,6 +28,7 @@ def user_logged_in_callback(sender, request, user, **kwargs):
     ip = get_client_ip(request)
     date = datetime.now()
     log.info(f'Login user: {user} Ip: {ip} Date: {date}')
+    throttle.reset(user.get_username())
 
 @receiver(user_logged_out)
 def user_logged_out_callback(sender, request, user, **kwargs):
@@ -42,7 +41,10 @@ def user_logged_out_callback(sender, request, user, **kwargs):
 def user_login_failed_callback(sender, request, credentials, **kwargs):
     ip = get_client_ip(request)
     date = datetime.now()
-    log.warning(f"Login failed for: {credentials['username']} Ip: {ip} Date: {date}")
+    username = credentials.get('username')
+    log.warning(f"Login failed for: {username} Ip: {ip} Date: {date}")
+    if not throttle.is_locked(username, ip):  # rejected attempts do not extend the lockout
+        throttle.record_failure(username, ip)
 
 
 class IndexView(generic.ListView):
@@ -57,6 +59,13 @@ class IndexView(generic.ListView):
                                        ).order_by('-pub_date')
         # return Question.objects.all()
 
+    def get_context_data(self, **kwargs):
+        """Add the set of open question ids used for the vote links."""
+        context = super().get_context_data(**kwargs)
+        context['open_question_ids'] = open_question_ids()
+        context['voted_question_ids'] = user_votes(self.request.user)
+        return context
+
 
 class DetailView(LoginRequiredMixin, generic.DetailView):
     """View of the detail page."""
@@ -68,29 +77,19 @@ class DetailView(LoginRequiredMixin, generic.DetailView):
         """Handle request and return the appropriate response page."""
         try:
             question = Question.objects.get(pk=kwargs['pk'])
-            if not question.can_vote():
-                messages.error(request, "That question is not allowed for voting.")
-                return redirect('polls:index')
-
         except ObjectDoesNotExist:
             messages.error(request, "That question does not exist.")
             return redirect('polls:index')
+        if not is_open(question.id):
+            messages.error(request, "That question is not allowed for voting.")
+            return redirect('polls:index')
 
         voter = request.user
-        self.object = self.get_object()
+        self.object = question
         context = self.get_context_data(object=self.object)
-        context['prev_choice'] = ""
-        context['button_text'] = "Vote"
-
-        try:  # check whether the voter re-vote the same question
-            prev_vote = Vote.objects.get(question=question, voter=voter)
-            # prev_choice = Choice.objects.get(pk=prev_vote.values()[0]["choice_id"])
-            prev_choice = prev_vote.choice
-            context['prev_choice'] = prev_choice.choice_text
-            context['button_text'] = "Re-Vote"
-        except ObjectDoesNotExist:  # new vote
-            pass
-
+        context['prev_choice'] = user_votes(voter).get(question.id)
+        # check whether the voter re-vote the same question
+        context['button_text'] = "Vote" if context['prev_choice'] is None else "Re-Vote"
         return self.render_to_response(context)
 
     # def get_context_data(self, **kwargs):
@@ -130,11 +129,37 @@ class ResultsView(generic.DetailView):
         except ObjectDoesNotExist:
             messages.error(request, "That question does not exist.")
             return redirect('polls:index')
-        self.object = self.get_object()
+        self.object = question
         context = self.get_context_data(object=self.object)
+        context['can_vote'] = is_open(question.id)
+        if question.ranked:
+            choices = sorted(question.choice_set.all(), key=lambda choice: choice.id)
+            names = {choice.id: choice.choice_text for choice in choices}
+            context['ranked_choices'] = choices
+            context['rounds'] = [
+                {'counts': counts,
+                 'eliminated': names.get(eliminated),
+                 'winner': names.get(winner)}
+                for counts, eliminated, winner in get_tally(question).rounds()
+            ]
         return self.render_to_response(context)
 
 
+def results_series(request, pk):
+    """Return the vote counts of a question over time as chart data."""
+    question = get_object_or_404(Question, pk=pk, pub_date__lte=timezone.now())
+    resolution = request.GET.get('resolution', VoteRollup.MINUTE)
+    if resolution not in rollups.ORDER:
+        return JsonResponse({'error': f'Unknown resolution: {resolution}'}, status=400)
+    choices = question.choice_set.order_by('id').values_list('id', 'choice_text')
+    return JsonResponse({
+        'question': question.id,
+        'resolution': resolution,
+        'choices': [{'id': choice_id, 'text': text} for choice_id, text in choices],
+        'series': rollups.series(question, resolution),
+    })
+
+
 # class Vote(generic.)
 
 @login_required
@@ -143,6 +168,12 @@ def vote(request, question_id):
 
     voter = request.user
     question = get_object_or_404(Question, pk=question_id)
+    if not is_open(question.id):
+        messages.error(request, "That question is not allowed for voting.")
+        return redirect('polls:index')
+
+    if question.ranked:
+        return vote_ranked(request, question)
 
     try:
         selected_choice = \
@@ -155,15 +186,13 @@ def vote(request, question_id):
                       })
     else:  # other exceptions or succession
         # prev_vote = Vote.objects.filter(question=question, voter=voter)
-        ip = get_client_ip(request)
-        date = datetime.now()
-        log.info(f'Login user: {voter} Ip: {ip} Date: {date} Question_Id: {question.id}')
-
         increment = 1
+        prev_choice_id = None
         try:  # check whether the voter re-vote the same question
             prev_vote = Vote.objects.get(question=question, voter=voter)
             # prev_choice = Choice.objects.get(pk=prev_vote.values()[0]["choice_id"])
             prev_choice = prev_vote.choice
+            prev_choice_id = prev_choice.id
             if prev_choice.id == selected_choice.id:
                 increment = 0
             prev_choice.votes -= 1
@@ -173,10 +202,15 @@ def vote(request, question_id):
 
         # print(f"----------------------\n{increment}\n--------------------\n")
 
+        vote_time = timezone.now()
         Vote.objects.update_or_create(
             voter=voter, question=question,
-            defaults={'choice': selected_choice}
+            defaults={'choice': selected_choice, 'voted_at': vote_time}
         )
+        record_user_vote(voter, question.id, selected_choice.id)
+        tasks.enqueue('after_vote', voter=str(voter), ip=get_client_ip(request), date=str(datetime.now()),
+                      question_ids=[question.id], when=vote_time.isoformat(),
+                      votes=[[question.id, selected_choice.id, prev_choice_id]])
         selected_choice.votes += increment
         selected_choice.save()
         return HttpResponseRedirect(reverse(
@@ -185,3 +219,74 @@ def vote(request, question_id):
         ))
 
 
+def ranking_from_post(question, data):
+    """Return the choice ids ranked in the rank_<choice id> fields, best first.
+
+    Raise ValueError if the ranks are not the distinct numbers 1 to n.
+    """
+    ranks = {}
+    for choice_id in question.choice_set.values_list('id', flat=True):
+        value = data.get(f'rank_{choice_id}', '').strip()
+        if not value:
+            continue
+        rank = int(value)
+        if rank < 1 or rank in ranks:
+            raise ValueError(f'Invalid rank: {value}')
+        ranks[rank] = choice_id
+    if sorted(ranks) != list(range(1, len(ranks) + 1)):
+        raise ValueError(f'Ranks have gaps: {sorted(ranks)}')
+    return [ranks[rank] for rank in sorted(ranks)]
+
+
+def vote_ranked(request, question):
+    """Handle the ballot of a ranked-choice question."""
+    voter = request.user
+    try:
+        ranking = ranking_from_post(question, request.POST)
+    except ValueError:
+        ranking = None
+    if not ranking:
+        return render(request, 'polls/detail.html',
+                      {
+                          'question': question,
+                          'error_message': "Please rank the choices with distinct numbers starting at 1.",
+                      })
+
+    tasks.enqueue('after_vote', voter=str(voter), ip=get_client_ip(request), date=str(datetime.now()),
+                  question_ids=[question.id], when=timezone.now().isoformat(), votes=[])
+    ballot = RankedBallot(question=question, voter=voter)
+    ballot.set_ranking(ranking)
+    RankedBallot.objects.update_or_create(
+        voter=voter, question=question,
+        defaults={'ranking': ballot.ranking}
+    )
+    record_user_vote(voter, question.id, ranking[0])
+    return HttpResponseRedirect(reverse(
+        'polls:results',
+        args=(question.id,)
+    ))
+
+
+@login_required
+def survey(request):
+    """Show every open question on one page and handle the votes for all of them at once."""
+    questions = Question.objects.filter(pk__in=open_question_ids(), ranked=False
+                                        ).order_by('-pub_date').prefetch_related('choice_set')
+    if request.method != 'POST':
+        return render(request, 'polls/survey.html', {'questions': questions})
+
+    try:
+        selections = selections_from_post(request.POST)
+    except ValueError:
+        selections = {}
+    valid = validate_selections(selections) if selections else {}
+    if not valid or len(valid) != len(selections):
+        return render(request, 'polls/survey.html',
+                      {
+                          'questions': questions,
+                          'error_message': "Please select one choice of an open question for each answer.",
+                      })
+
+    submit_survey(request.user, valid, ip=get_client_ip(request))
+    messages.success(request, f"Your votes for {len(valid)} question(s) were saved.")
+    return redirect('polls:index')